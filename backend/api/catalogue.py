@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import threading
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.renderers import JSONRenderer
+from recipe.cache_versions import ingredients_version, tags_version
+from recipe.models import Ingredient, Tag
+from .serializers import IngredienteSerializer, TagSerializer
+
+CONTENT_TYPE = 'application/json'
+
+
+def coding_weights(accept_encoding):
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    return weights
+
+
+def accepts_gzip(request):
+    weights = coding_weights(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+class Catalogue:
+
+    def __init__(self, model, serializer_class, version):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.version = version
+        self._lock = threading.Lock()
+        self._rendered = None
+        self._version = None
+
+    def _build(self):
+        serializer = self.serializer_class(
+            self.model.objects.all(),
+            many=True,
+        )
+        body = JSONRenderer().render(serializer.data)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        return {
+            'identity': (body, f'"{digest}"'),
+            'gzip': (gzip.compress(body), f'"{digest}-gzip"'),
+        }
+
+    def rendered(self):
+        version = self.version.current()
+        rendered = self._rendered
+        if rendered is None or self._version != version:
+            with self._lock:
+                if self._rendered is None or self._version != version:
+                    self._rendered = self._build()
+                    self._version = version
+                rendered = self._rendered
+        return rendered
+
+    def invalidate(self):
+        with self._lock:
+            self._rendered = None
+
+    def response(self, request):
+        encoding = 'gzip' if accepts_gzip(request) else 'identity'
+        body, etag = self.rendered()[encoding]
+        response = HttpResponse(body, content_type=CONTENT_TYPE)
+        if encoding == 'gzip':
+            response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        return get_conditional_response(
+            request,
+            etag=etag,
+            response=response,
+        ) or response
+
+
+ingredient_catalogue = Catalogue(
+    Ingredient,
+    IngredienteSerializer,
+    ingredients_version,
+)
+tag_catalogue = Catalogue(Tag, TagSerializer, tags_version)
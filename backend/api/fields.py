@@ -0,0 +1,114 @@
+import base64
+import binascii
+import uuid
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+from rest_framework import serializers
+
+
+class RecipeImageField(serializers.ImageField):
+
+    allowed_formats = {
+        'JPEG': 'jpg',
+        'PNG': 'png',
+        'GIF': 'gif',
+        'WEBP': 'webp',
+    }
+    default_error_messages = {
+        'invalid': 'Изображение должно быть файлом или строкой base64.',
+        'invalid_image': 'Файл не является изображением.',
+        'max_size': 'Размер не должен превышать {max_size}.',
+        'max_pixels': 'Изображение не должно превышать {max_pixels} пикселей.',
+    }
+
+    def __init__(self, max_size=25 * 1024 * 1024, max_pixels=None, **kwargs):
+        self.max_size = max_size
+        self.max_pixels = max_pixels or getattr(
+            settings,
+            'IMAGE_MAX_PIXELS',
+            40 * 10 ** 6,
+        )
+        super().__init__(**kwargs)
+
+    def fail_max_size(self):
+        self.fail('max_size', max_size=filesizeformat(self.max_size))
+
+    def decoded_size(self, encoded):
+        return len(encoded) * 3 // 4 - encoded[-2:].count('=')
+
+    def fail_max_pixels(self):
+        self.fail('max_pixels', max_pixels=self.max_pixels)
+
+    def open_image(self, file):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', Image.DecompressionBombWarning)
+                image = Image.open(file)
+                image.verify()
+        except (Image.DecompressionBombWarning, Image.DecompressionBombError):
+            self.fail_max_pixels()
+        except Exception:
+            self.fail('invalid_image')
+        if image.format not in self.allowed_formats:
+            self.fail('invalid_image')
+        width, height = image.size
+        if width * height > self.max_pixels:
+            self.fail_max_pixels()
+        file.seek(0)
+        return image
+
+    def file_name(self, image):
+        return f'{uuid.uuid4()}.{self.allowed_formats[image.format]}'
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            if data.size > self.max_size:
+                self.fail_max_size()
+            image = self.open_image(data)
+            data.name = self.file_name(image)
+            data.content_type = Image.MIME[image.format]
+            data.image = image
+            return data
+        if not isinstance(data, str):
+            self.fail('invalid')
+        encoded = data.rpartition(';base64,')[2].strip()
+        if self.decoded_size(encoded) > self.max_size:
+            self.fail_max_size()
+        try:
+            buffer = BytesIO(base64.b64decode(encoded))
+        except (binascii.Error, ValueError):
+            self.fail('invalid')
+        image = self.open_image(buffer)
+        file = InMemoryUploadedFile(
+            file=buffer,
+            field_name=None,
+            name=self.file_name(image),
+            content_type=Image.MIME[image.format],
+            size=buffer.getbuffer().nbytes,
+            charset=None,
+        )
+        file.image = image
+        return file
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        storage = self.parent.Meta.model._meta.get_field('image').storage
+        representation = {}
+        for variant, files in variants.items():
+            if variant == 'source':
+                continue
+            representation[variant] = {}
+            for extension, name in files.items():
+                url = storage.url(name)
+                if request:
+                    url = request.build_absolute_uri(url)
+                representation[variant][extension] = url
+        return representation
@@ -0,0 +1,81 @@
+import threading
+from bisect import bisect_left
+
+from recipe.cache_versions import ingredients_version
+from recipe.models import Ingredient
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def _build(self):
+        ingredients = Ingredient.objects.values_list(
+            'id',
+            'name',
+            'measurement_unit',
+        )
+        return sorted(
+            (name.lower(), pk, name, unit)
+            for pk, name, unit in ingredients
+        )
+
+    def _entries(self):
+        version = ingredients_version.current()
+        index = self._index
+        if index is None or self._version != version:
+            with self._lock:
+                if self._index is None or self._version != version:
+                    self._index = self._build()
+                    self._version = version
+                index = self._index
+        return index
+
+    def _replace(self, pk, version, entry=None):
+        with self._lock:
+            if self._index is None:
+                return
+            if self._version != version - 1:
+                self._index = None
+                return
+            index = [item for item in self._index if item[1] != pk]
+            if entry is not None:
+                index.insert(bisect_left(index, entry), entry)
+            self._index = index
+            self._version = version
+
+    def update(self, ingredient, version):
+        self._replace(ingredient.pk, version, (
+            ingredient.name.lower(),
+            ingredient.pk,
+            ingredient.name,
+            ingredient.measurement_unit,
+        ))
+
+    def remove(self, pk, version):
+        self._replace(pk, version)
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def search(self, query):
+        index = self._entries()
+        query = query.lower()
+        start = end = bisect_left(index, (query,))
+        while end < len(index) and index[end][0].startswith(query):
+            end += 1
+        contains = [
+            entry for entry in index
+            if query in entry[0] and not entry[0].startswith(query)
+        ]
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in index[start:end] + contains
+        ]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,218 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger('api.queries')
+profile_logger = logging.getLogger('api.profiling')
+
+UNSAFE_FILENAME = re.compile(r'[^\w.-]+')
+
+
+class QueryStats:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(
+            count - 1 for count in self.statements.values() if count > 1
+        )
+
+
+def get_query_budget(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    view = match.func
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    budgets = getattr(getattr(view, 'cls', None), 'query_budgets', {})
+    return budgets.get(action)
+
+
+class QueryBudgetMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def capture(self, stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    def stream(self, content, stats, report):
+        content = iter(content)
+        try:
+            while True:
+                with self.capture(stats):
+                    chunk = next(content, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            report()
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with self.capture(stats):
+            response = self.get_response(request)
+        budget = get_query_budget(request)
+        if budget is not None:
+            response['X-Query-Budget'] = budget
+
+        def report():
+            self.report(request, response, stats, budget)
+
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content,
+                stats,
+                report,
+            )
+            return response
+        response['X-Query-Count'] = stats.count
+        response['X-Query-Duration'] = f'{stats.duration * 1000:.1f}'
+        response['X-Query-Duplicates'] = stats.duplicates
+        report()
+        return response
+
+    def report(self, request, response, stats, budget):
+        over_budget = budget is not None and stats.count > budget
+        (logger.warning if over_budget else logger.info)(
+            '%s %s: %s запросов к БД',
+            request.method,
+            request.path,
+            stats.count,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status_code': response.status_code,
+                'query_count': stats.count,
+                'query_duration_ms': round(stats.duration * 1000, 1),
+                'duplicate_queries': stats.duplicates,
+                'query_budget': budget,
+            },
+        )
+
+
+def rotate_profiles(directory, max_bytes):
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        total -= size
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        self.paths = settings.PROFILE_PATHS
+        self.token = settings.PROFILE_TOKEN
+        if not (self.sample_rate > 0 or self.paths or self.token):
+            raise MiddlewareNotUsed
+        self.directory = settings.PROFILE_DIR
+        self.max_bytes = settings.PROFILE_DIR_MAX_BYTES
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def reason(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        if self.token and token and constant_time_compare(token, self.token):
+            return 'header'
+        if self.paths and request.path.startswith(self.paths):
+            return 'path'
+        if random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        reason = self.reason(request)
+        if reason is None or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+            duration = time.perf_counter() - started
+        finally:
+            self.lock.release()
+        try:
+            name = self.save(request, response, profile, duration, reason)
+        except OSError:
+            profile_logger.exception(
+                'Не удалось сохранить профиль %s', request.path,
+            )
+        else:
+            if reason == 'header':
+                response['X-Profile'] = name
+        return response
+
+    def save(self, request, response, profile, duration, reason):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        created = datetime.now(timezone.utc)
+        name = UNSAFE_FILENAME.sub('_', (
+            f'{created:%Y%m%dT%H%M%S}_{view}_'
+            f'{duration * 1000:.0f}ms_{uuid.uuid4().hex[:8]}'
+        ))
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(f'{path}.prof')
+        with open(f'{path}.json', 'w', encoding='utf-8') as file:
+            json.dump(
+                {
+                    'created': created.isoformat(),
+                    'method': request.method,
+                    'path': request.path,
+                    'query_string': request.META.get('QUERY_STRING', ''),
+                    'view': view,
+                    'status_code': response.status_code,
+                    'duration_ms': round(duration * 1000, 1),
+                    'reason': reason,
+                },
+                file,
+                ensure_ascii=False,
+            )
+        rotate_profiles(self.directory, self.max_bytes)
+        return name
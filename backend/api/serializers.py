@@ -2,11 +2,11 @@ from rest_framework import serializers
 from users.models import User
 from recipe.models import Tag, Recipe, Ingredient, Amount
 from .exceptions import UsernameValueException
-from drf_extra_fields.fields import Base64ImageField
-from django.shortcuts import get_object_or_404
-from PIL import Image
+from django.db import transaction
 import re
 from .messages import amount_error_message, cooking_time_error_message
+from .utils import get_subscribed_ids
+from .fields import RecipeImageField, ImageVariantsField
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -42,10 +42,10 @@ class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, author):
-        user = self.context['request'].user
-        if user.is_anonymous or user == author:
+        request = self.context['request']
+        if request.user.is_anonymous or request.user == author:
             return False
-        return user.follower.filter(author=author).exists()
+        return author.id in get_subscribed_ids(request)
 
     class Meta:
 
@@ -66,10 +66,10 @@ class UserRecipeSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, author):
-        user = self.context['request'].user
-        if user.is_anonymous or user == author:
+        request = self.context['request']
+        if request.user.is_anonymous or request.user == author:
             return False
-        return user.follower.filter(author=author).exists()
+        return author.id in get_subscribed_ids(request)
 
     class Meta:
 
@@ -87,35 +87,27 @@ class UserRecipeSerializer(serializers.ModelSerializer):
 
 class SubscribeRecipeSerializer(serializers.ModelSerializer):
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
 
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
-
-    def get_recipes(self, user):
-        recipes_limit = self.context.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=user)
-        if recipes_limit:
-            queryset = queryset[:int(recipes_limit)]
-        serializer = SubscribeRecipeSerializer(
-            queryset,
-            many=True,
-            context=self.context,
-        )
-        return serializer.data
-
-    def get_recipes_count(self, user):
-        return user.recipes.count()
+    recipes = SubscribeRecipeSerializer(
+        source='limited_recipes',
+        many=True,
+        read_only=True,
+    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
 
@@ -141,21 +133,15 @@ class TagSerializer(serializers.ModelSerializer):
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
 
-    amount = serializers.SerializerMethodField()
-
-    def get_amount(self, ingredient):
-        amount = ingredient.amount.values('amount')
-        return amount[0]['amount']
-
-    def validate_amount(value):
-        if not isinstance(value, int):
-            raise serializers.ValidationError(
-                'Значение должно быть целым числом.'
-            )
+    id = serializers.ReadOnlyField(source='ingredients.id')
+    name = serializers.ReadOnlyField(source='ingredients.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredients.measurement_unit',
+    )
 
     class Meta:
 
-        model = Ingredient
+        model = Amount
         fields = (
             'id',
             'name',
@@ -168,21 +154,17 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
-    ingredients = IngredientRecipeSerializer(many=True, read_only=True)
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-
-    def get_is_favorited(self, recipe):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return user.user_favorites.filter(recipe=recipe).exists()
-
-    def get_is_in_shopping_cart(self, recipe):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return user.shopping_cart.filter(recipe=recipe).exists()
+    ingredients = IngredientRecipeSerializer(
+        source='amount',
+        many=True,
+        read_only=True,
+    )
+    is_favorited = serializers.BooleanField(read_only=True, default=False)
+    is_in_shopping_cart = serializers.BooleanField(
+        read_only=True,
+        default=False,
+    )
+    image_variants = ImageVariantsField()
 
     class Meta:
 
@@ -196,6 +178,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
@@ -225,58 +208,89 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         many=True
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
     cooking_time = serializers.IntegerField(
         min_value=1,
         allow_null=True,
         error_messages=cooking_time_error_message,
     )
 
+    def validate_ingredients(self, value):
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.'
+            )
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}.'
+            )
+        return [
+            {'ingredient': ingredients[item['id']], 'amount': item['amount']}
+            for item in value
+        ]
+
+    def create_amounts(self, recipe, ingredients):
+        Amount.objects.bulk_create([
+            Amount(
+                recipe=recipe,
+                ingredients=item['ingredient'],
+                amount=item['amount'],
+            )
+            for item in ingredients
+        ])
+
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         tags = validated_data.pop('tags')
         recipe_ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
-        recipe.author = request.user
-        recipe.tags.set(tags)
-        for ingredient in recipe_ingredients:
-            amount = ingredient['amount']
-            ingredient = get_object_or_404(Ingredient, pk=ingredient['id'])
-            Amount.objects.create(
-                recipe=recipe,
-                ingredients=ingredient,
-                amount=amount,
-            )
-        recipe.save()
+        recipe = Recipe.objects.create(author=request.user, **validated_data)
+        recipe.tags.add(*tags)
+        self.create_amounts(recipe, recipe_ingredients)
         return recipe
 
+    def update_amounts(self, recipe, ingredients):
+        current = {
+            amount.ingredients_id: amount
+            for amount in recipe.amount.all()
+        }
+        ingredients = {item['ingredient'].pk: item for item in ingredients}
+        removed = [
+            amount.pk for pk, amount in current.items()
+            if pk not in ingredients
+        ]
+        changed = []
+        for pk, item in ingredients.items():
+            amount = current.get(pk)
+            if amount is not None and amount.amount != item['amount']:
+                amount.amount = item['amount']
+                changed.append(amount)
+        added = [item for pk, item in ingredients.items() if pk not in current]
+        if removed:
+            Amount.objects.filter(pk__in=removed).delete()
+        if changed:
+            Amount.objects.bulk_update(changed, ('amount',))
+        if added:
+            self.create_amounts(recipe, added)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        recipe_ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags', None)
+        recipe_ingredients = validated_data.pop('ingredients', None)
         recipe = instance
-        recipe.tags.clear()
-        recipe.tags.add(*tags)
-        Amount.objects.filter(recipe=recipe).delete()
         for key, value in validated_data.items():
             setattr(recipe, key, value)
-        for ingredient in recipe_ingredients:
-            amount = ingredient['amount']
-            ingredient = get_object_or_404(Ingredient, pk=ingredient['id'])
-            Amount.objects.create(
-                recipe=recipe,
-                ingredients=ingredient,
-                amount=amount,
-            )
-        recipe.save()
+        if validated_data:
+            recipe.save(update_fields=validated_data.keys())
+        if tags is not None:
+            recipe.tags.set(tags)
+        if recipe_ingredients is not None:
+            self.update_amounts(recipe, recipe_ingredients)
         return recipe
 
-    def validate_image(self, value):
-        try:
-            Image.open(value).verify()
-        except Exception:
-            raise serializers.ValidationError('Файл не является изображением.')
-        return value
-
     def validate_cooking_time(self, value):
         if not value:
             raise serializers.ValidationError(
@@ -309,10 +323,18 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
 
     tags = TagSerializer(many=True, read_only=True)
     author = UserRecipeSerializer(read_only=True)
-    ingredients = IngredientRecipeSerializer(many=True)
+    ingredients = IngredientRecipeSerializer(
+        source='amount',
+        many=True,
+        read_only=True,
+    )
     image = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
+    is_favorited = serializers.BooleanField(read_only=True, default=False)
+    is_in_shopping_cart = serializers.BooleanField(
+        read_only=True,
+        default=False,
+    )
+    image_variants = ImageVariantsField()
 
     def get_image(self, recipe):
         request = self.context.get('request')
@@ -321,18 +343,6 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             return absolute_image_url
         return None
 
-    def get_is_favorited(self, recipe):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.user_favorites.filter(recipe=recipe).exists()
-
-    def get_is_in_shopping_cart(self, recipe):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.shopping_cart.filter(recipe=recipe).exists()
-
     class Meta:
 
         model = Recipe
@@ -345,6 +355,7 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
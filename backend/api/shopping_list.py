@@ -0,0 +1,197 @@
+import csv
+import os
+import threading
+import zlib
+
+from reportlab.pdfbase.ttfonts import (
+    FF_NONSYMBOLIC,
+    FF_SYMBOLIC,
+    SUBSETN,
+    TTFont,
+    makeToUnicodeCMap,
+)
+
+TITLE = 'Ваш список покупок:'
+CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 11
+PDF_LEADING = 16
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_FONT_PATH = os.path.join(
+    os.path.dirname(__file__),
+    'fonts',
+    'DejaVuSans.ttf',
+)
+
+pdf_font_lock = threading.Lock()
+pdf_font_cache = []
+
+
+def txt_chunks(rows):
+    yield f'{TITLE}\n'
+    for name, total, unit in rows:
+        yield f'{name} {total} {unit}\n'
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def pdf_font():
+    with pdf_font_lock:
+        if not pdf_font_cache:
+            pdf_font_cache.append(
+                TTFont('DejaVuSans', PDF_FONT_PATH, asciiReadable=True)
+            )
+        return pdf_font_cache[0]
+
+
+def pdf_stream(body, **entries):
+    entries['Length'] = len(body)
+    dictionary = ' '.join(f'/{key} {value}' for key, value in entries.items())
+    return f'<< {dictionary} >>\nstream\n'.encode() + body + b'\nendstream'
+
+
+def pdf_page_content(font, document, lines):
+    content = [
+        b'BT\n',
+        f'{PDF_LEADING} TL\n'.encode(),
+        f'{PDF_MARGIN} {PDF_PAGE_HEIGHT - PDF_MARGIN} Td\n'.encode(),
+    ]
+    for line in lines:
+        for subset, chunk in font.splitString(line, document):
+            content.append(
+                f'/F{subset} {PDF_FONT_SIZE} Tf <{chunk.hex()}> Tj\n'
+                .encode()
+            )
+        content.append(b'T*\n')
+    content.append(b'ET\n')
+    return b''.join(content)
+
+
+def pdf_font_objects(font, index, subset, number):
+    face = font.face
+    with pdf_font_lock:
+        font_file = face.makeSubset(subset)
+    base_font = (SUBSETN(index) + b'+' + face.name).decode()
+    flags = face.flags & ~FF_NONSYMBOLIC | FF_SYMBOLIC
+    bbox = ' '.join(str(value) for value in face.bbox)
+    widths = ' '.join(str(face.getCharWidth(code)) for code in subset)
+    return (
+        pdf_stream(
+            zlib.compress(font_file),
+            Filter='/FlateDecode',
+            Length1=len(font_file),
+        ),
+        (
+            f'<< /Type /FontDescriptor /FontName /{base_font} '
+            f'/Flags {flags} /FontBBox [{bbox}] '
+            f'/ItalicAngle {face.italicAngle} /Ascent {face.ascent} '
+            f'/Descent {face.descent} /CapHeight {face.capHeight} '
+            f'/StemV {face.stemV} /FontFile2 {number + 1} 0 R >>'
+        ).encode(),
+        pdf_stream(makeToUnicodeCMap(base_font, subset).encode()),
+        (
+            f'<< /Type /Font /Subtype /TrueType /BaseFont /{base_font} '
+            f'/FirstChar 0 /LastChar {len(subset) - 1} /Widths [{widths}] '
+            f'/FontDescriptor {number + 2} 0 R '
+            f'/ToUnicode {number + 3} 0 R >>'
+        ).encode(),
+    )
+
+
+def pdf_pages(rows):
+    page = [TITLE]
+    for name, total, unit in rows:
+        if len(page) == PDF_LINES_PER_PAGE:
+            yield page
+            page = []
+        page.append(f'{name} {total} {unit}')
+    yield page
+
+
+class PDFWriter:
+
+    def __init__(self):
+        self.offsets = [0, 0, 0, 0]
+        self.position = 0
+
+    def raw(self, chunk):
+        self.position += len(chunk)
+        return chunk
+
+    def write(self, number, body):
+        if number < len(self.offsets):
+            self.offsets[number] = self.position
+        else:
+            self.offsets.append(self.position)
+        return self.raw(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+
+def pdf_chunks(rows):
+    font = pdf_font()
+    document = PDFWriter()
+    write = document.write
+    try:
+        yield document.raw(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        number = 3
+        pages = []
+        for lines in pdf_pages(rows):
+            content = pdf_page_content(font, document, lines)
+            yield write(number + 1, pdf_stream(content))
+            yield write(
+                number + 2,
+                (
+                    f'<< /Type /Page /Parent 2 0 R '
+                    f'/MediaBox [0 0 {PDF_PAGE_WIDTH} {PDF_PAGE_HEIGHT}] '
+                    f'/Resources 3 0 R /Contents {number + 1} 0 R >>'
+                ).encode(),
+            )
+            number += 2
+            pages.append(number)
+        fonts = []
+        for index, subset in enumerate(font.state[document].subsets):
+            for body in pdf_font_objects(font, index, subset, number):
+                number += 1
+                yield write(number, body)
+            fonts.append(f'/F{index} {number} 0 R')
+        yield write(
+            3,
+            f'<< /Font << {" ".join(fonts)} >> >>'.encode(),
+        )
+        kids = ' '.join(f'{page} 0 R' for page in pages)
+        yield write(
+            2,
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'
+            .encode(),
+        )
+        yield write(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        position = document.position
+        yield f'xref\n0 {number + 1}\n0000000000 65535 f \n'.encode()
+        for offset in document.offsets[1:]:
+            yield f'{offset:010d} 00000 n \n'.encode()
+        yield (
+            f'trailer\n<< /Size {number + 1} /Root 1 0 R >>\n'
+            f'startxref\n{position}\n%%EOF\n'
+        ).encode()
+    finally:
+        font.state.pop(document, None)
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (txt_chunks, 'text/plain; charset=utf-8'),
+    'csv': (csv_chunks, 'text/csv; charset=utf-8'),
+    'pdf': (pdf_chunks, 'application/pdf'),
+}
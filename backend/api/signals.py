@@ -0,0 +1,37 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipe.cache_versions import ingredients_version, tags_version
+from recipe.models import Ingredient, Tag
+from .catalogue import ingredient_catalogue, tag_catalogue
+from .ingredient_index import ingredient_index
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: ingredient_index.update(
+        instance,
+        ingredients_version.bump(),
+    ))
+
+
+@receiver(post_delete, sender=Ingredient)
+def remove_from_ingredient_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: ingredient_index.remove(
+        pk,
+        ingredients_version.bump(),
+    ))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalogue(sender, **kwargs):
+    transaction.on_commit(ingredient_catalogue.invalidate)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_catalogue(sender, **kwargs):
+    transaction.on_commit(tags_version.bump)
+    transaction.on_commit(tag_catalogue.invalidate)
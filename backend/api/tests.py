@@ -1,3 +1,951 @@
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from recipe.search import search_postgresql
+from recipe.models import (
+    CacheVersion,
+    Tag,
+    Recipe,
+    Favorite,
+    Ingredient,
+    Amount,
+    ShoppingСart,
+)
+from users.models import User, Subscription
+from PIL import Image
+from .catalogue import ingredient_catalogue, tag_catalogue
+from .fields import RecipeImageField
+from .ingredient_index import ingredient_index
+from .views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    TagViewSet,
+    UserViewSet,
+)
+from io import BytesIO
+import base64
+import gzip
+import json
+import os
+import pstats
+import re
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+SEARCH_INDEX_QUERIES = int(connection.vendor == 'sqlite')
+
+
+class RecipeListQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.bulk_create([
+            Tag(name='Завтрак', color='#E26C2D', slug='breakfast'),
+            Tag(name='Обед', color='#49B64E', slug='lunch'),
+        ])
+        cls.tags = Tag.objects.all()
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(5)
+        ])
+        cls.ingredients = Ingredient.objects.all()
+        cls.authors = [
+            User.objects.create(
+                username=f'author{i}',
+                email=f'author{i}@foodgram.ru',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for i in range(10)
+        ]
+        for i in range(100):
+            recipe = Recipe.objects.create(
+                author=cls.authors[i % len(cls.authors)],
+                name=f'Рецепт {i}',
+                image='recipes/images/test.png',
+                text='Описание',
+                cooking_time=10,
+            )
+            recipe.tags.set(cls.tags)
+            Amount.objects.bulk_create([
+                Amount(recipe=recipe, ingredients=ingredient, amount=i + 1)
+                for ingredient in cls.ingredients
+            ])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/', {'limit': 10})
+        self.assertEqual(len(response.data['results']), 10)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/', {'limit': 100})
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertEqual(len(response.data['results'][0]['tags']), 2)
+        self.assertEqual(len(response.data['results'][0]['ingredients']), 5)
+
+    def test_authenticated_list_query_count(self):
+        reader = User.objects.create(
+            username='reader',
+            email='reader@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        Subscription.objects.create(author=self.authors[0], user=reader)
+        self.client.force_authenticate(reader)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/', {'limit': 100})
+        subscribed = {
+            recipe['author']['id']
+            for recipe in response.data['results']
+            if recipe['author']['is_subscribed']
+        }
+        self.assertEqual(subscribed, {self.authors[0].id})
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/users/', {'limit': 20})
+        self.assertEqual(len(response.data['results']), 11)
+
+    def test_retrieve_query_count(self):
+        recipe = Recipe.objects.first()
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.data['author']['id'], recipe.author_id)
+
+    def test_ingredient_amounts_belong_to_recipe(self):
+        recipe = Recipe.objects.get(name='Рецепт 42')
+        response = self.client.get(f'/api/recipes/{recipe.id}/')
+        ingredient = response.data['ingredients'][0]
+        self.assertEqual(ingredient['amount'], 43)
+        self.assertEqual(ingredient['measurement_unit'], 'г')
+
+
+class ShoppingCartDownloadTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='buyer',
+            email='buyer@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        milk = Ingredient.objects.create(name='молоко', measurement_unit='мл')
+        for i in range(30):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {i}',
+                image='recipes/images/test.png',
+                text='Описание',
+                cooking_time=10,
+            )
+            Amount.objects.create(recipe=recipe, ingredients=salt, amount=2)
+            Amount.objects.create(recipe=recipe, ingredients=milk, amount=10)
+            ShoppingСart.objects.create(recipe=recipe, user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_format=None):
+        params = {'format': file_format} if file_format else {}
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/',
+            params,
+        )
+        return response, b''.join(response.streaming_content)
+
+    def test_totals_are_aggregated_in_one_query(self):
+        with self.assertNumQueries(2):
+            response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('молоко 300 мл', content.decode())
+        self.assertIn('соль 60 г', content.decode())
+
+    def test_csv_format(self):
+        response, content = self.download('csv')
+        self.assertIn('shopping_list.csv', response['Content-Disposition'])
+        self.assertIn('соль,60,г', content.decode())
+
+    def test_pdf_format(self):
+        response, content = self.download('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.endswith(b'%%EOF\n'))
+        self.assertIn(b'/FontFile2', content)
+        self.assertIn(b'/Widths', content)
+        self.assertNotIn(b'/Helvetica', content)
+        self.assertEqual(
+            pdf_text(content),
+            ['Ваш список покупок:', 'молоко 300 мл', 'соль 60 г'],
+        )
+
+    def test_empty_cart(self):
+        ShoppingСart.objects.all().delete()
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 400)
+
+
+class IngredientSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('сахар', 'сахарная пудра', 'ванильный сахар', 'соль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def search(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_matches_go_before_substring_matches(self):
+        self.assertEqual(
+            self.search('Сах'),
+            ['сахар', 'сахарная пудра', 'ванильный сахар'],
+        )
+
+    def test_search_does_not_hit_database_once_built(self):
+        self.search('с')
+        with self.assertNumQueries(0):
+            self.search('со')
+
+    def test_index_follows_model_changes(self):
+        self.search('с')
+        with self.captureOnCommitCallbacks(execute=True):
+            salt = Ingredient.objects.get(name='соль')
+            salt.name = 'соль морская'
+            salt.save()
+            Ingredient.objects.filter(name='сахар').delete()
+        self.assertEqual(self.search('соль'), ['соль морская'])
+        self.assertNotIn('сахар', self.search('сахар'))
+
+    @override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+    def test_index_follows_bulk_load_from_another_process(self):
+        self.search('с')
+        Ingredient.objects.bulk_create([
+            Ingredient(name='сахарин', measurement_unit='г'),
+        ])
+        CacheVersion.objects.update_or_create(
+            name='ingredients',
+            defaults={'version': 100},
+        )
+        self.assertIn('сахарин', self.search('сахар'))
+        with self.assertNumQueries(1):
+            self.search('сахар')
+
+
+class CatalogueTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def setUp(self):
+        ingredient_catalogue.invalidate()
+        tag_catalogue.invalidate()
+        self.client = APIClient()
+
+    def test_catalogue_is_rendered_once(self):
+        self.client.get('/api/ingredients/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/')
+        self.assertEqual(
+            json.loads(response.content),
+            [{'id': Ingredient.objects.get().id, 'name': 'соль',
+              'measurement_unit': 'г'}],
+        )
+
+    def test_gzip_and_not_modified(self):
+        response = self.client.get(
+            '/api/tags/',
+            HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content))[0]['slug'],
+            'dinner',
+        )
+        response = self.client.get(
+            '/api/tags/',
+            HTTP_ACCEPT_ENCODING='gzip, deflate',
+            HTTP_IF_NONE_MATCH=f'W/{response["ETag"]}',
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_representations_have_own_etags(self):
+        compressed = self.client.get(
+            '/api/tags/',
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        for accept_encoding in ('', 'gzip;q=0', 'br, gzip; q=0.0'):
+            response = self.client.get(
+                '/api/tags/',
+                HTTP_ACCEPT_ENCODING=accept_encoding,
+                HTTP_IF_NONE_MATCH=compressed['ETag'],
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Content-Encoding', response)
+            self.assertNotEqual(response['ETag'], compressed['ETag'])
+        response = self.client.get(
+            '/api/tags/',
+            HTTP_ACCEPT_ENCODING='identity;q=0.5, *;q=0.1',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_etag_changes_when_model_changes(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Десерт', color='#FFFFFF', slug='sweet')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    @override_settings(CACHE_VERSION_CHECK_INTERVAL=0)
+    def test_etag_changes_after_load_from_another_process(self):
+        etag = self.client.get('/api/ingredients/')['ETag']
+        Ingredient.objects.bulk_create([
+            Ingredient(name='перец', measurement_unit='г'),
+        ])
+        CacheVersion.objects.update_or_create(
+            name='ingredients',
+            defaults={'version': 100},
+        )
+        response = self.client.get(
+            '/api/ingredients/',
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+
+class SubscriptionsQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader',
+            email='reader@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        for i in range(20):
+            author = User.objects.create(
+                username=f'chef{i}',
+                email=f'chef{i}@foodgram.ru',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            Subscription.objects.create(author=author, user=cls.user)
+            for j in range(i % 5 + 1):
+                Recipe.objects.create(
+                    author=author,
+                    name=f'Рецепт {i}-{j}',
+                    image='recipes/images/test.png',
+                    text='Описание',
+                    cooking_time=10,
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_subscriptions_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                '/api/users/subscriptions/',
+                {'limit': 20, 'recipes_limit': 2},
+            )
+        self.assertEqual(len(response.data['results']), 20)
+        for author in response.data['results']:
+            count = int(author['username'][4:]) % 5 + 1
+            self.assertEqual(author['recipes_count'], count)
+            self.assertEqual(len(author['recipes']), min(count, 2))
+
+    def test_recipes_limit_keeps_latest_recipes(self):
+        response = self.client.get(
+            '/api/users/subscriptions/',
+            {'limit': 20, 'recipes_limit': 1},
+        )
+        author = next(
+            author for author in response.data['results']
+            if author['username'] == 'chef4'
+        )
+        self.assertEqual(author['recipes'][0]['name'], 'Рецепт 4-4')
+
+
+class RecipeCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author',
+            email='author@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        for i in range(25):
+            Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {i}',
+                image='recipes/images/test.png',
+                text='Описание',
+                cooking_time=10,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_walks_the_whole_feed(self):
+        names = []
+        url = '/api/recipes/?cursor=&limit=10'
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            names += [recipe['name'] for recipe in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(names, [f'Рецепт {i}' for i in range(24, -1, -1)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/', {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get('/api/recipes/', {'page': 2})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+def pdf_text(content):
+    objects = dict(re.findall(rb'(\d+) 0 obj\n(.*?)\nendobj', content, re.S))
+    fonts = {}
+    for name, number in re.findall(rb'/F(\d+) (\d+) 0 R', objects[b'3']):
+        cmap = objects[re.search(rb'/ToUnicode (\d+)', objects[number])[1]]
+        fonts[name] = {
+            int(code, 16): chr(int(char, 16))
+            for code, char in re.findall(rb'<(\w\w)> <(\w{4})>', cmap)
+        }
+    lines = []
+    for page in re.findall(rb'(\d+) 0 R', objects[b'2'].split(b'[')[1]):
+        contents = re.search(rb'/Contents (\d+)', objects[page])[1]
+        for line in objects[contents].split(b'T*')[:-1]:
+            lines.append(''.join(
+                fonts[name][code]
+                for name, chunk in re.findall(
+                    rb'/F(\d+) \d+ Tf <(\w*)> Tj',
+                    line,
+                )
+                for code in bytes.fromhex(chunk.decode())
+            ))
+    return lines
+
+
+def base64_image(file_format='PNG', size=(10, 10)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, file_format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/{file_format.lower()};base64,{encoded}'
+
+
+class RecipeImageFieldTest(TestCase):
+
+    def test_decodes_once_and_sniffs_format(self):
+        field = RecipeImageField()
+        file = field.run_validation(base64_image('JPEG', (30, 20)))
+        self.assertTrue(file.name.endswith('.jpg'))
+        self.assertEqual(file.content_type, 'image/jpeg')
+        self.assertEqual(file.image.size, (30, 20))
+        self.assertTrue(file.read().startswith(b'\xff\xd8'))
+
+    def test_size_is_checked_before_decoding(self):
+        field = RecipeImageField(max_size=100)
+        with self.assertRaises(ValidationError) as error:
+            field.run_validation('data:image/png;base64,' + '!' * 200)
+        self.assertEqual(
+            error.exception.detail,
+            ['Размер не должен превышать 100\xa0байт.'],
+        )
+        field = RecipeImageField(max_size=1536)
+        with self.assertRaises(ValidationError) as error:
+            field.run_validation(SimpleUploadedFile(
+                'huge.png',
+                b'!' * 2048,
+                content_type='image/png',
+            ))
+        self.assertEqual(
+            error.exception.detail,
+            ['Размер не должен превышать 1,5\xa0КБ.'],
+        )
+
+    def test_rejects_too_many_pixels(self):
+        message = ['Изображение не должно превышать 300 пикселей.']
+        field = RecipeImageField(max_pixels=300)
+        with self.assertRaises(ValidationError) as error:
+            field.run_validation(base64_image('PNG', (20, 20)))
+        self.assertEqual(error.exception.detail, message)
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100):
+            with self.assertRaises(ValidationError) as error:
+                field.run_validation(base64_image('PNG', (12, 12)))
+        self.assertEqual(error.exception.detail, message)
+        field.run_validation(base64_image('PNG', (15, 20)))
+
+    def test_rejects_non_images(self):
+        field = RecipeImageField()
+        encoded = base64.b64encode(b'not an image').decode()
+        with self.assertRaises(ValidationError):
+            field.run_validation(f'data:image/png;base64,{encoded}')
+
+
+class RecipeWriteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='cook',
+            email='cook@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед',
+            color='#49B64E',
+            slug='lunch',
+        )
+        cls.salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.milk = Ingredient.objects.create(
+            name='молоко',
+            measurement_unit='мл',
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe_data(self, **kwargs):
+        data = {
+            'ingredients': [
+                {'id': self.salt.id, 'amount': 5},
+                {'id': self.milk.id, 'amount': 200},
+            ],
+            'tags': [self.tag.id],
+            'image': base64_image(),
+            'name': 'Омлет',
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+        data.update(kwargs)
+        return data
+
+    def test_create_recipe(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.author, self.user)
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        amounts = [amount['amount'] for amount in response.data['ingredients']]
+        self.assertEqual(sorted(amounts), [5, 200])
+
+    def test_invalid_image(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(image='data:image/png;base64,AAAA'),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+
+    def test_create_recipe_from_multipart(self):
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10), 'green').save(buffer, 'JPEG')
+        data = self.recipe_data(
+            image=SimpleUploadedFile('photo.jpg', buffer.getvalue()),
+            ingredients=json.dumps([{'id': self.salt.id, 'amount': 3}]),
+        )
+        response = self.client.post('/api/recipes/', data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['ingredients'][0]['amount'], 3)
+        self.assertEqual(response.data['tags'][0]['id'], self.tag.id)
+        response = self.client.patch(
+            f'/api/recipes/{response.data["id"]}/',
+            {'name': 'Омлет с сыром', 'tags': [self.tag.id],
+             'ingredients': 'not json'},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_multipart_upload_is_renamed_by_format(self):
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10), 'green').save(buffer, 'PNG')
+        data = self.recipe_data(
+            image=SimpleUploadedFile(
+                'x.html',
+                buffer.getvalue(),
+                content_type='text/html',
+            ),
+            ingredients=json.dumps([{'id': self.salt.id, 'amount': 3}]),
+        )
+        response = self.client.post('/api/recipes/', data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        image = Recipe.objects.get().image.name
+        self.assertTrue(image.endswith('.png'))
+        self.assertNotIn('html', image)
+
+    def test_write_is_batched_and_atomic(self):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'специя {i}', measurement_unit='г')
+            for i in range(20)
+        ])
+        data = self.recipe_data(ingredients=[
+            {'id': ingredient.id, 'amount': 1}
+            for ingredient in Ingredient.objects.all()
+        ])
+        with self.assertNumQueries(10 + SEARCH_INDEX_QUERIES):
+            response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data['ingredients']), 22)
+
+    def test_duplicate_and_unknown_ingredients(self):
+        for ingredients in (
+            [{'id': self.salt.id, 'amount': 1}] * 2,
+            [{'id': self.salt.id, 'amount': 1}, {'id': 0, 'amount': 1}],
+        ):
+            response = self.client.post(
+                '/api/recipes/',
+                self.recipe_data(ingredients=ingredients),
+                format='json',
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ingredients', response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_update_only_touches_changed_rows(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(),
+            format='json',
+        )
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        amounts = dict(recipe.amount.values_list('ingredients', 'id'))
+        with self.assertNumQueries(6 + SEARCH_INDEX_QUERIES):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/',
+                {'name': 'Омлет с сыром'},
+                format='json',
+            )
+        self.assertEqual(response.data['name'], 'Омлет с сыром')
+        self.assertEqual(
+            dict(recipe.amount.values_list('ingredients', 'id')),
+            amounts,
+        )
+        pepper = Ingredient.objects.create(name='перец', measurement_unit='г')
+        response = self.client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {'ingredients': [
+                {'id': self.salt.id, 'amount': 7},
+                {'id': pepper.id, 'amount': 1},
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            dict(recipe.amount.values_list('ingredients', 'amount')),
+            {self.salt.id: 7, pepper.id: 1},
+        )
+        self.assertEqual(
+            recipe.amount.get(ingredients=self.salt).id,
+            amounts[self.salt.id],
+        )
+
+
+class RecipeSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name, text in (
+            ('Борщ украинский', 'Свёкла, капуста и мясо'),
+            ('Салат из свёклы', 'Подавать к борщу'),
+            ('Омлет', 'Яйца и молоко'),
+        ):
+            Recipe.objects.create(
+                name=name,
+                text=text,
+                image='recipes/images/test.png',
+                cooking_time=10,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(
+            self.search('борщ'),
+            ['Борщ украинский', 'Салат из свёклы'],
+        )
+
+    def test_index_follows_changes(self):
+        omelette = Recipe.objects.get(name='Омлет')
+        omelette.name = 'Омлет с сыром'
+        omelette.save()
+        self.assertEqual(self.search('сыр'), ['Омлет с сыром'])
+        omelette.delete()
+        self.assertEqual(self.search('омлет'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_index_follows_bulk_writes(self):
+        Recipe.objects.filter(name='Омлет').update(name='Сырники')
+        Recipe.objects.bulk_create([Recipe(
+            name='Сырный суп',
+            text='Плавленый сыр',
+            image='recipes/images/test.png',
+            cooking_time=20,
+        )])
+        self.assertEqual(self.search('омлет'), [])
+        self.assertEqual(self.search('сыр'), ['Сырный суп', 'Сырники'])
+
+    def test_postgresql_query_uses_search_vector(self):
+        sql = str(search_postgresql(Recipe.objects.all(), 'борщ').query)
+        self.assertIn('websearch_to_tsquery', sql)
+        self.assertIn('"recipe_recipe"."search_vector" @@', sql)
+        self.assertIn('ts_rank', sql)
+
+
+class QueryBudgetMixin:
+
+    def assertWithinQueryBudget(self, response):
+        self.assertIn('X-Query-Budget', response, 'Не задан бюджет запросов.')
+        if response.streaming:
+            with self.assertLogs('api.queries', 'INFO') as logs:
+                b''.join(response.streaming_content)
+            count = logs.records[-1].query_count
+        else:
+            count = int(response['X-Query-Count'])
+        budget = int(response['X-Query-Budget'])
+        self.assertLessEqual(
+            count,
+            budget,
+            f'{response.wsgi_request.method} {response.wsgi_request.path}: '
+            f'{count} запросов при бюджете {budget}.',
+        )
+        return response
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader',
+            email='reader@foodgram.ru',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед',
+            color='#49B64E',
+            slug='lunch',
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(5)
+        ])
+        cls.ingredients = list(Ingredient.objects.all())
+        for i in range(20):
+            author = User.objects.create(
+                username=f'chef{i}',
+                email=f'chef{i}@foodgram.ru',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            Subscription.objects.create(author=author, user=cls.user)
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {i}',
+                image='recipes/images/test.png',
+                text='Описание',
+                cooking_time=10,
+            )
+            recipe.tags.add(cls.tag)
+            Amount.objects.bulk_create([
+                Amount(recipe=recipe, ingredients=ingredient, amount=i + 1)
+                for ingredient in cls.ingredients
+            ])
+            ShoppingСart.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe = recipe
+        cls.author = author
+        cls.own_recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Свой рецепт',
+            image='recipes/images/test.png',
+            text='Описание',
+            cooking_time=10,
+        )
+        for reader in User.objects.exclude(pk=cls.user.pk):
+            Favorite.objects.create(user=reader, recipe=cls.own_recipe)
+            ShoppingСart.objects.create(user=reader, recipe=cls.own_recipe)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def requests(self):
+        recipe = f'/api/recipes/{self.recipe.id}/'
+        own_recipe = f'/api/recipes/{self.own_recipe.id}/'
+        user = f'/api/users/{self.author.id}/'
+        ingredients = [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in self.ingredients
+        ]
+        data = {
+            'ingredients': ingredients,
+            'tags': [self.tag.id],
+            'image': base64_image(),
+            'name': 'Омлет',
+            'text': 'Описание',
+            'cooking_time': 10,
+        }
+        return (
+            ('get', '/api/users/', {'limit': 20}),
+            ('get', user, None),
+            ('get', '/api/users/me/', None),
+            ('get', '/api/users/subscriptions/', {'limit': 20}),
+            ('delete', f'{user}subscribe/', None),
+            ('post', f'{user}subscribe/', None),
+            ('get', '/api/tags/', None),
+            ('get', f'/api/tags/{self.tag.id}/', None),
+            ('get', '/api/ingredients/', None),
+            ('get', '/api/ingredients/', {'name': 'Ингр'}),
+            ('get', f'/api/ingredients/{self.ingredients[0].id}/', None),
+            ('get', '/api/recipes/', {'limit': 20}),
+            ('get', '/api/recipes/', {'limit': 20, 'is_favorited': 1}),
+            ('get', recipe, None),
+            ('post', '/api/recipes/', data),
+            ('patch', own_recipe, {'name': 'Новое имя'}),
+            ('patch', own_recipe, data),
+            ('post', f'{recipe}favorite/', None),
+            ('delete', f'{recipe}favorite/', None),
+            ('delete', f'{recipe}shopping_cart/', None),
+            ('post', f'{recipe}shopping_cart/', None),
+            ('get', '/api/recipes/download_shopping_cart/', None),
+            ('delete', own_recipe, None),
+        )
+
+    def test_streamed_queries_are_counted(self):
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertNotIn('X-Query-Count', response)
+        with self.assertLogs('api.queries', 'INFO') as logs:
+            content = b''.join(response.streaming_content)
+        self.assertIn('Ваш список покупок', content.decode())
+        record = logs.records[-1]
+        self.assertEqual(record.path, '/api/recipes/download_shopping_cart/')
+        self.assertEqual(record.query_count, 3)
+
+    def test_every_action_fits_its_budget(self):
+        actions = set()
+        for method, url, data in self.requests():
+            with self.subTest(method=method, url=url):
+                response = getattr(self.client, method)(
+                    url,
+                    data,
+                    format='json' if method in ('post', 'patch') else None,
+                )
+                self.assertLess(response.status_code, 400)
+                self.assertWithinQueryBudget(response)
+                match = response.wsgi_request.resolver_match
+                actions.add((
+                    match.func.cls.__name__,
+                    match.func.actions[method],
+                ))
+        declared = {
+            (viewset.__name__, action)
+            for viewset in (
+                UserViewSet,
+                TagViewSet,
+                RecipeViewSet,
+                IngredientViewSet,
+            )
+            for action in viewset.query_budgets
+        }
+        self.assertEqual(actions, declared)
+
+
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def client_with(self, **options):
+        profiling = override_settings(PROFILE_DIR=self.directory, **options)
+        profiling.enable()
+        self.addCleanup(profiling.disable)
+        return APIClient()
+
+    def profiles(self, extension):
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.endswith(extension)
+        )
+
+    def test_disabled_by_default(self):
+        self.client_with().get('/api/tags/')
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_path_match_writes_profile_and_metadata(self):
+        client = self.client_with(PROFILE_PATHS=('/api/tags/',))
+        client.get('/api/ingredients/')
+        client.get('/api/tags/')
+        self.assertEqual(len(self.profiles('.prof')), 1)
+        metadata, = self.profiles('.json')
+        with open(os.path.join(self.directory, metadata)) as file:
+            metadata = json.load(file)
+        self.assertEqual(metadata['view'], 'api:tags-list')
+        self.assertEqual(metadata['reason'], 'path')
+        self.assertEqual(metadata['status_code'], 200)
+        pstats.Stats(os.path.join(self.directory, self.profiles('.prof')[0]))
+
+    def test_header_requires_token(self):
+        client = self.client_with(PROFILE_TOKEN='secret')
+        response = client.get('/api/tags/', HTTP_X_PROFILE='wrong')
+        self.assertNotIn('X-Profile', response)
+        response = client.get('/api/tags/', HTTP_X_PROFILE='secret')
+        self.assertEqual(
+            self.profiles('.prof'),
+            [f'{response["X-Profile"]}.prof'],
+        )
+
+    def test_directory_is_capped(self):
+        client = self.client_with(
+            PROFILE_SAMPLE_RATE=1,
+            PROFILE_DIR_MAX_BYTES=1,
+        )
+        for _ in range(3):
+            client.get('/api/tags/')
+        self.assertEqual(os.listdir(self.directory), [])
@@ -22,3 +22,11 @@ class AddAndDelMixin:
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+
+def get_subscribed_ids(request):
+    if not hasattr(request, 'subscribed_ids'):
+        request.subscribed_ids = set(
+            request.user.follower.values_list('author_id', flat=True)
+        )
+    return request.subscribed_ids
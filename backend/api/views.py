@@ -9,19 +9,40 @@ from .serializers import (
     CreateRecipeSerializer,
     RecipeDetailSerializer,
 )
-from .paginators import Pagination
+from .paginators import Pagination, RecipePagination
 from djoser.views import UserViewSet as DjoserUVS
-from recipe.models import Tag, Recipe, Favorite, Ingredient, ShoppingСart
+from recipe.search import search_recipes
+from recipe.models import (
+    Tag,
+    Recipe,
+    Favorite,
+    Ingredient,
+    ShoppingСart,
+    Amount,
+)
+from django.db.models import (
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    prefetch_related_objects,
+)
 from .permissions import ObjAuthorOrReadOnly
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
+from django.http import QueryDict, StreamingHttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from .renderers import PlainTextRenderer, CSVRenderer, PDFRenderer
+from .shopping_list import SHOPPING_LIST_FORMATS
+from .ingredient_index import ingredient_index
+from .catalogue import ingredient_catalogue, tag_catalogue
+import json
 from .utils import AddAndDelMixin
-import base64
-import sys
 
 
 class UserViewSet(DjoserUVS, viewsets.ModelViewSet, AddAndDelMixin):
@@ -31,6 +52,13 @@ class UserViewSet(DjoserUVS, viewsets.ModelViewSet, AddAndDelMixin):
     pagination_class = Pagination
     permission_classes = (IsAuthenticated, ObjAuthorOrReadOnly)
     http_method_names = ('get', 'post', 'delete',)
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'me': 2,
+        'subscriptions': 4,
+        'subscribe': 6,
+    }
 
     subscriptions_args = {
         'methods': ('get',),
@@ -40,14 +68,31 @@ class UserViewSet(DjoserUVS, viewsets.ModelViewSet, AddAndDelMixin):
 
     @action(**subscriptions_args)
     def subscriptions(self, request):
+        recipes = Recipe.objects.all()
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author'),
+                ).values('pk')[:int(recipes_limit)]
+            ))
         queryset = self.paginate_queryset(
-            User.objects.filter(following__user=request.user)
+            User.objects.filter(
+                following__user=request.user,
+            ).order_by(
+                'username',
+            ).prefetch_related(
+                Prefetch(
+                    'recipes',
+                    queryset=recipes,
+                    to_attr='limited_recipes',
+                ),
+            )
         )
-        recipes_limit = self.request.query_params.get('recipes_limit')
         serializer = SubscribeSerializer(
             queryset,
             many=True,
-            context={'request': request, 'recipes_limit': recipes_limit},
+            context={'request': request},
         )
         return self.get_paginated_response(serializer.data)
 
@@ -72,39 +117,70 @@ class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     http_method_names = ('get',)
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+    }
+
+    def list(self, request, *args, **kwargs):
+        return tag_catalogue.response(request)
 
 
 class RecipeViewSet(viewsets.ModelViewSet, AddAndDelMixin):
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    pagination_class = Pagination
+    pagination_class = RecipePagination
     permission_classes = (ObjAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     http_method_names = ('get', 'post', 'patch', 'delete',)
+    query_budgets = {
+        'list': 6,
+        'retrieve': 5,
+        'create': 12,
+        'partial_update': 14,
+        'destroy': 11,
+        'favorite': 6,
+        'shopping_cart': 6,
+        'download_shopping_cart': 3,
+    }
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+    prefetch_lookups = (
+        'tags',
+        Prefetch(
+            'amount',
+            queryset=Amount.objects.select_related('ingredients'),
+        ),
+    )
 
-    def img_size_validator(self, request):
-        if request.data.get('image'):
-            data = request.data.get('image').split(';base64,')[-1]
-            size = sys.getsizeof(base64.urlsafe_b64decode(data + '=='))
-            if size > 25 * 1024 * 1024:
-                return False
-            return True
-        return True
+    def get_recipe_data(self, request):
+        if not isinstance(request.data, QueryDict):
+            return request.data
+        data = {
+            key: request.data[key]
+            for key in request.data
+            if key not in ('tags', 'ingredients')
+        }
+        if 'tags' in request.data:
+            data['tags'] = request.data.getlist('tags')
+        if 'ingredients' in request.data:
+            try:
+                data['ingredients'] = json.loads(request.data['ingredients'])
+            except ValueError:
+                raise ParseError(
+                    'Поле ingredients должно содержать JSON-список.'
+                )
+        return data
 
     def create(self, request, *args, **kwargs):
-        if not self.img_size_validator(request):
-            return Response(
-                {'image': 'Размер не должен привышать 25MB'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
         serializer = CreateRecipeSerializer(
-            data=request.data,
+            data=self.get_recipe_data(request),
             context={'request': request},
             )
         if serializer.is_valid():
             self.perform_create(serializer)
             recipe = serializer.instance
+            prefetch_related_objects([recipe], *self.prefetch_lookups)
             serializer = RecipeDetailSerializer(
                 recipe,
                 context={'request': request},
@@ -113,21 +189,17 @@ class RecipeViewSet(viewsets.ModelViewSet, AddAndDelMixin):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def update(self, request, pk, partial):
-        if not self.img_size_validator(request):
-            return Response(
-                {'image': 'Размер не должен привышать 25MB'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
         instance = self.get_object()
         serializer = CreateRecipeSerializer(
             instance,
-            data=request.data,
+            data=self.get_recipe_data(request),
             partial=partial,
             context={'request': request},
         )
         if serializer.is_valid():
             self.perform_update(serializer)
             recipe = serializer.instance
+            prefetch_related_objects([recipe], *self.prefetch_lookups)
             serializer = RecipeSerializer(
                 recipe,
                 context={'request': request},
@@ -137,7 +209,11 @@ class RecipeViewSet(viewsets.ModelViewSet, AddAndDelMixin):
 
     def get_queryset(self):
         user = self.request.user
-        queryset = self.queryset
+        queryset = self.queryset.with_user_flags(user).select_related(
+            'author',
+        )
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related(*self.prefetch_lookups)
         if not user.is_anonymous:
             is_favorited = self.request.query_params.get('is_favorited')
             if is_favorited == '1':
@@ -155,6 +231,9 @@ class RecipeViewSet(viewsets.ModelViewSet, AddAndDelMixin):
         tags = self.request.query_params.getlist('tags')
         if tags:
             queryset = queryset.filter(tags__slug__in=tags)
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = search_recipes(queryset, search)
         return queryset.distinct()
 
     favorite_args = {
@@ -184,38 +263,45 @@ class RecipeViewSet(viewsets.ModelViewSet, AddAndDelMixin):
     download_args = {
         'methods': ('get',),
         'detail': False,
-        'permission_classes': (IsAuthenticated,)
+        'permission_classes': (IsAuthenticated,),
+        'renderer_classes': (
+            JSONRenderer,
+            PlainTextRenderer,
+            CSVRenderer,
+            PDFRenderer,
+        ),
     }
 
     @action(**download_args)
     def download_shopping_cart(self, request):
         user = request.user
-        if user.shopping_cart.exists():
-            filename = 'shopping_list.txt'
-            ingredients_dict = {}
-            file = []
-            head = 'Ваш список покупок:\n'
-            file.append(head)
-            for cart in user.shopping_cart.all():
-                for i in cart.recipe.amount.all():
-                    name = i.ingredients.name
-                    amount = i.amount
-                    unit = i.ingredients.measurement_unit
-                    if name in ingredients_dict:
-                        ingredients_dict[name][0] += amount
-                        continue
-                    ingredients_dict[name] = [amount, unit]
-            for key, value in ingredients_dict.items():
-                file.append(f'{key} {value[0]} {value[1]}\n')
-            response = HttpResponse(
-                file,
-                content_type='text/plain'
-            )
-            response['Content-Disposition'] = (
-                f'attachment; name="shopping_list"; filename="{filename}"'
-            )
-            return response
-        return Response(status=status.HTTP_400_BAD_REQUEST)
+        ingredients = Amount.objects.filter(
+            recipe__in_shopping_carts__user=user,
+        ).values(
+            'ingredients__name',
+            'ingredients__measurement_unit',
+        ).annotate(
+            total=Sum('amount'),
+        ).order_by('ingredients__name').values_list(
+            'ingredients__name',
+            'total',
+            'ingredients__measurement_unit',
+        )
+        if not ingredients.exists():
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.accepted_renderer.format
+        if file_format not in SHOPPING_LIST_FORMATS:
+            file_format = 'txt'
+        writer, content_type = SHOPPING_LIST_FORMATS[file_format]
+        filename = f'shopping_list.{file_format}'
+        response = StreamingHttpResponse(
+            writer(ingredients.iterator()),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; name="shopping_list"; filename="{filename}"'
+        )
+        return response
 
 
 class IngredientViewSet(viewsets.ModelViewSet):
@@ -223,3 +309,13 @@ class IngredientViewSet(viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredienteSerializer
     http_method_names = ('get',)
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+    }
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        return ingredient_catalogue.response(request)
@@ -0,0 +1,266 @@
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yaml
+
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / 'docs/openapi-schema.yml'
+PAGE_SIZES = (6, 10, 20)
+TRAFFIC_MIX = (
+    ('feed', 'get', '/api/recipes/', 30),
+    ('feed_tags', 'get', '/api/recipes/', 10),
+    ('feed_favorited', 'get', '/api/recipes/', 5),
+    ('recipe', 'get', '/api/recipes/{id}/', 15),
+    ('autocomplete', 'get', '/api/ingredients/', 20),
+    ('tags', 'get', '/api/tags/', 4),
+    ('subscriptions', 'get', '/api/users/subscriptions/', 4),
+    ('favorite', 'post', '/api/recipes/{id}/favorite/', 4),
+    ('unfavorite', 'delete', '/api/recipes/{id}/favorite/', 4),
+    ('download_cart', 'get', '/api/recipes/download_shopping_cart/', 4),
+)
+
+
+class Operation:
+
+    def __init__(self, name, method, path, weight, spec):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.weight = weight
+        self.operation_id = spec.get('operationId', name)
+        self.query_params = {
+            parameter['name'] for parameter in spec.get('parameters', ())
+            if parameter.get('in') == 'query'
+        }
+
+
+def load_operations(schema_path):
+    with open(schema_path, encoding='utf-8') as file:
+        paths = yaml.safe_load(file)['paths']
+    operations = []
+    for name, method, path, weight in TRAFFIC_MIX:
+        spec = paths.get(path, {}).get(method)
+        if spec is None:
+            raise SystemExit(
+                f'{method.upper()} {path} нет в схеме {schema_path}.'
+            )
+        operations.append(Operation(name, method, path, weight, spec))
+    return operations
+
+
+class Dataset:
+
+    def __init__(self, clients, seed):
+        from django.db.models import Count
+        from rest_framework.authtoken.models import Token
+        from recipe.models import Ingredient, Recipe, Tag
+        from users.models import User
+
+        rng = random.Random(seed)
+        recipes = list(Recipe.objects.order_by('pk').values_list(
+            'pk',
+            'favorites_count',
+        ))
+        if not recipes:
+            raise SystemExit(
+                'База пуста: сначала выполните manage.py seed_scale.'
+            )
+        self.recipes = [pk for pk, _ in recipes]
+        self.recipe_weights = [count + 1 for _, count in recipes]
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        names = Ingredient.objects.values_list('name', flat=True)
+        self.prefixes = sorted({
+            name[:length].lower() for name in names for length in (1, 2, 3)
+        })
+        users = list(User.objects.annotate(
+            carts=Count('shopping_cart'),
+        ).filter(carts__gt=0).values_list('pk', flat=True))
+        users = users or list(User.objects.values_list('pk', flat=True))
+        self.tokens = [
+            Token.objects.get_or_create(user_id=pk)[0].key
+            for pk in rng.sample(users, min(clients, len(users)))
+        ]
+
+    def params(self, operation, rng):
+        name = operation.name
+        if name.startswith('feed'):
+            params = {'limit': rng.choice(PAGE_SIZES)}
+            if rng.random() < 0.8:
+                params['page'] = 1
+            else:
+                params['page'] = rng.randint(2, 5)
+            if name == 'feed_tags' and self.tags:
+                params['tags'] = rng.sample(
+                    self.tags,
+                    rng.randint(1, min(2, len(self.tags))),
+                )
+            if name == 'feed_favorited':
+                params['is_favorited'] = 1
+            return params
+        if name == 'autocomplete':
+            return {'name': rng.choice(self.prefixes)}
+        if name == 'subscriptions':
+            return {'limit': 6, 'recipes_limit': 3}
+        return {}
+
+    def path(self, operation, rng):
+        recipe = rng.choices(self.recipes, weights=self.recipe_weights)[0]
+        return operation.path.format(id=recipe)
+
+
+def percentile(samples, percent):
+    rank = math.ceil(percent / 100 * len(samples))
+    return samples[max(rank, 1) - 1]
+
+
+class Stats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, elapsed, status_code):
+        with self.lock:
+            self.latencies[name].append(elapsed * 1000)
+            if status_code >= 500:
+                self.errors[name] += 1
+
+    def report(self, duration):
+        rows = {}
+        for name, samples in sorted(self.latencies.items()):
+            samples.sort()
+            rows[name] = {
+                'requests': len(samples),
+                'errors': self.errors[name],
+                'rps': round(len(samples) / duration, 1),
+                'p50_ms': round(percentile(samples, 50), 2),
+                'p95_ms': round(percentile(samples, 95), 2),
+                'p99_ms': round(percentile(samples, 99), 2),
+            }
+        return rows
+
+
+def worker(number, operations, dataset, stats, deadline, seed):
+    from django.db import connections
+    from django.test import Client
+
+    rng = random.Random(f'{seed}:{number}')
+    client = Client(
+        SERVER_NAME='localhost',
+        HTTP_AUTHORIZATION=(
+            f'Token {dataset.tokens[number % len(dataset.tokens)]}'
+        ),
+        raise_request_exception=False,
+    )
+    weights = [operation.weight for operation in operations]
+    try:
+        while time.monotonic() < deadline:
+            operation = rng.choices(operations, weights=weights)[0]
+            params = dataset.params(operation, rng)
+            undocumented = set(params) - operation.query_params
+            if undocumented:
+                raise SystemExit(
+                    f'{operation.operation_id}: параметры {undocumented} '
+                    f'не описаны в схеме.'
+                )
+            request = getattr(client, operation.method)
+            path = dataset.path(operation, rng)
+            started = time.perf_counter()
+            if operation.method == 'get':
+                response = request(path, params)
+            else:
+                response = request(path)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            stats.record(
+                operation.name,
+                time.perf_counter() - started,
+                response.status_code,
+            )
+    finally:
+        connections.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            'Нагрузочный прогон WSGI-приложения смесью запросов, '
+            'построенной по docs/openapi-schema.yml. Запускать на '
+            'заполненной базе (manage.py seed_scale): прогон добавляет '
+            'и удаляет записи избранного.'
+        ),
+    )
+    parser.add_argument('--schema', default=SCHEMA_PATH)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Куда сохранить результаты JSON.')
+    args = parser.parse_args()
+    operations = load_operations(args.schema)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    import django
+
+    django.setup()
+    logging.getLogger('api.queries').setLevel(logging.ERROR)
+    dataset = Dataset(args.clients, args.seed)
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        futures = [
+            executor.submit(
+                worker,
+                number,
+                operations,
+                dataset,
+                stats,
+                deadline,
+                args.seed,
+            )
+            for number in range(args.clients)
+        ]
+        for future in futures:
+            future.result()
+    duration = time.monotonic() - started
+    report = stats.report(duration)
+    names = {operation.name: operation for operation in operations}
+    print(f'{"operation":<16}{"requests":>9}{"errors":>7}{"rps":>8}'
+          f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}  method path')
+    for name, row in report.items():
+        operation = names[name]
+        print(f'{name:<16}{row["requests"]:>9}{row["errors"]:>7}'
+              f'{row["rps"]:>8}{row["p50_ms"]:>9}{row["p95_ms"]:>9}'
+              f'{row["p99_ms"]:>9}  {operation.method.upper()} '
+              f'{operation.path}')
+    total = sum(row['requests'] for row in report.values())
+    print(f'Всего: {total} запросов за {duration:.1f} с, '
+          f'{total / duration:.1f} запросов/с.')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(
+                {
+                    'clients': args.clients,
+                    'duration': round(duration, 1),
+                    'operations': report,
+                },
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+    if any(row['errors'] for row in report.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import time
+import tracemalloc
+
+from api.shopping_list import SHOPPING_LIST_FORMATS
+
+CART_SIZES = (1_000, 10_000, 100_000)
+
+
+def rows(count):
+    for i in range(count):
+        yield f'ингредиент {i}', i % 1000 + 1, 'г'
+
+
+def measure(writer, count):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = 0
+    for chunk in writer(rows(count)):
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Пиковая память при потоковой выгрузке списка покупок.',
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=CART_SIZES)
+    args = parser.parse_args()
+    print(f'{"format":<8}{"lines":>10}{"output KB":>12}'
+          f'{"peak KB":>10}{"time s":>9}')
+    for file_format, (writer, _) in SHOPPING_LIST_FORMATS.items():
+        for count in args.sizes:
+            size, peak, elapsed = measure(writer, count)
+            print(f'{file_format:<8}{count:>10}{size // 1024:>12}'
+                  f'{peak // 1024:>10}{elapsed:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import fnmatch
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from itertools import product
+
+PAGE_SIZES = (10, 100, 1000)
+FILTERS = {
+    'is_favorited': (None, '1', '0'),
+    'is_in_shopping_cart': (None, '1', '0'),
+    'author': (None, 'top'),
+    'tags': ((), ('lunch',), ('lunch', 'dinner')),
+}
+COMPARED = ('p50_ms', 'peak_kb', 'queries')
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    import django
+
+    django.setup()
+
+
+class Context:
+
+    def __init__(self):
+        from django.db.models import Count
+        from rest_framework.test import APIRequestFactory
+        from users.models import User
+
+        self.factory = APIRequestFactory(SERVER_NAME='localhost')
+        self.user = User.objects.annotate(
+            total=Count('user_favorites'),
+        ).order_by('-total', 'pk').first()
+        self.subscriber = User.objects.annotate(
+            total=Count('follower'),
+        ).order_by('-total', 'pk').first()
+        self.shopper = User.objects.annotate(
+            total=Count('shopping_cart'),
+        ).order_by('-total', 'pk').first()
+        self.author = User.objects.order_by('-recipes_count', 'pk').first()
+
+    def request(self, path, params=None, user=None):
+        from rest_framework.request import Request
+        from rest_framework.test import force_authenticate
+
+        request = self.factory.get(path, params or {})
+        force_authenticate(request, user=user or self.user)
+        return Request(request)
+
+    def recipe_view(self, action, params=None):
+        from api.views import RecipeViewSet
+
+        view = RecipeViewSet()
+        view.action = action
+        view.format_kwarg = None
+        view.request = self.request('/api/recipes/', params)
+        return view
+
+
+def serializer_case(context, serializer_class, action, size):
+    def run():
+        view = context.recipe_view(action)
+        queryset = view.get_queryset()[:size]
+        return serializer_class(
+            queryset,
+            many=True,
+            context={'request': view.request},
+        ).data
+    return run
+
+
+def queryset_case(context, params):
+    def run():
+        view = context.recipe_view('list', params)
+        queryset = view.get_queryset()
+        queryset.count()
+        return list(queryset[:10])
+    return run
+
+
+def view_case(context, viewset, actions, path, params=None, user=None):
+    handler = viewset.as_view(actions)
+
+    def run():
+        response = handler(context.request(path, params, user)._request)
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return response.render().content
+    return run
+
+
+def build_cases(context):
+    from api.serializers import RecipeDetailSerializer, RecipeSerializer
+    from api.views import RecipeViewSet, UserViewSet
+
+    cases = {}
+    for serializer_class, action in (
+        (RecipeSerializer, 'list'),
+        (RecipeDetailSerializer, 'retrieve'),
+    ):
+        for size in PAGE_SIZES:
+            cases[f'serializer.{serializer_class.__name__}.{size}'] = (
+                serializer_case(context, serializer_class, action, size)
+            )
+    cases['serializer.SubscribeSerializer'] = view_case(
+        context,
+        UserViewSet,
+        {'get': 'subscriptions'},
+        '/api/users/subscriptions/',
+        {'limit': 10, 'recipes_limit': 3},
+        context.subscriber,
+    )
+    for values in product(*FILTERS.values()):
+        params = {}
+        for name, value in zip(FILTERS, values):
+            if value == 'top':
+                value = context.author.pk
+            if value:
+                params[name] = list(value) if name == 'tags' else value
+        label = ','.join(
+            f'{name}={"+".join(value) if name == "tags" else value}'
+            for name, value in zip(FILTERS, values)
+            if value
+        ) or 'none'
+        cases[f'queryset.{label}'] = queryset_case(context, params)
+    cases['view.download_shopping_cart'] = view_case(
+        context,
+        RecipeViewSet,
+        {'get': 'download_shopping_cart'},
+        '/api/recipes/download_shopping_cart/',
+        user=context.shopper,
+    )
+    return cases
+
+
+def percentile(samples, percent):
+    samples = sorted(samples)
+    rank = math.ceil(percent / 100 * len(samples))
+    return samples[max(rank, 1) - 1]
+
+
+def measure(run, repeats, warmup):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        run()
+        reset_queries()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+        reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        run()
+    query_count = len(queries)
+    reset_queries()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    reset_queries()
+    return {
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'queries': query_count,
+        'repeats': repeats,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    import django
+    from django.db import connection
+    from recipe.models import Amount, Favorite, Recipe
+    from users.models import User
+
+    return {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'rows': {
+            model.__name__: model.objects.count()
+            for model in (User, Recipe, Amount, Favorite)
+        },
+    }
+
+
+def compare(baseline, results, threshold):
+    regressions = []
+    print(f'{"case":<60}{"metric":>9}{"before":>12}{"after":>12}'
+          f'{"change":>9}')
+    for name, after in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in COMPARED:
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else float(new > old)
+            marker = ''
+            if change > threshold:
+                marker = ' !'
+                regressions.append((name, metric))
+            print(f'{name:<60}{metric:>9}{old:>12}{new:>12}'
+                  f'{change:>+9.0%}{marker}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            'Замеры задержки, памяти и числа запросов для сериализаторов '
+            'и горячих выборок на заполненной базе (manage.py seed_scale).'
+        ),
+    )
+    parser.add_argument('--output', help='Куда сохранить результаты JSON.')
+    parser.add_argument('--compare', help='JSON с результатами для сравнения.')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument(
+        '--only',
+        default='*',
+        help='Шаблон имён замеров, например "serializer.*".',
+    )
+    args = parser.parse_args()
+    setup_django()
+    from recipe.models import Recipe
+
+    if not Recipe.objects.exists():
+        parser.error('База пуста: сначала выполните manage.py seed_scale.')
+    context = Context()
+    results = {}
+    for name, run in build_cases(context).items():
+        if not fnmatch.fnmatch(name, args.only):
+            continue
+        results[name] = measure(run, args.repeats, args.warmup)
+        print(
+            f'{name:<60}{results[name]["p50_ms"]:>10.2f} ms'
+            f'{results[name]["queries"]:>5} q',
+            file=sys.stderr,
+        )
+    report = {'meta': metadata(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        if compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,28 @@
 from django.contrib import admin
 from .models import Tag, Ingredient, Recipe, Amount
+from .paginators import EstimatedCountPaginator
+
+
+class AmountInline(admin.TabularInline):
+
+    model = Amount
+    autocomplete_fields = (
+        'ingredients',
+    )
+    extra = 0
+
+
+class TagAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'name',
+        'slug',
+        'color',
+    )
+    search_fields = (
+        'name',
+        'slug',
+    )
 
 
 class RecipeAdmin(admin.ModelAdmin):
@@ -9,24 +32,34 @@ class RecipeAdmin(admin.ModelAdmin):
         'author',
         'favorites',
     )
+    list_select_related = (
+        'author',
+    )
     readonly_fields = (
         'favorites',
     )
     list_filter = (
-        'name',
-        'author',
         'tags',
     )
     search_fields = (
         'name',
         'author__username',
-        'tags__name',
     )
+    autocomplete_fields = (
+        'author',
+        'tags',
+    )
+    inlines = (
+        AmountInline,
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     favorites.short_description = 'В избранном'
+    favorites.admin_order_field = 'favorites_count'
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -35,15 +68,33 @@ class IngredientAdmin(admin.ModelAdmin):
         'name',
         'measurement_unit',
     )
-    list_filter = (
-        'name',
-    )
     search_fields = (
         'name',
     )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class AmountAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'recipe',
+        'ingredients',
+        'amount',
+    )
+    list_select_related = (
+        'recipe',
+        'ingredients',
+    )
+    autocomplete_fields = (
+        'recipe',
+        'ingredients',
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-admin.site.register(Tag)
+admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(Amount)
+admin.site.register(Amount, AmountAdmin)
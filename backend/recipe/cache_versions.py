@@ -0,0 +1,47 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import CacheVersion
+
+
+class VersionMonitor:
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = None
+
+    def _remember(self, version):
+        with self._lock:
+            self._version = version
+            self._checked = time.monotonic()
+        return version
+
+    def current(self):
+        interval = getattr(settings, 'CACHE_VERSION_CHECK_INTERVAL', 5)
+        with self._lock:
+            checked = self._checked
+            if checked is not None and time.monotonic() - checked < interval:
+                return self._version
+        version = CacheVersion.objects.filter(name=self.name).values_list(
+            'version',
+            flat=True,
+        ).first() or 0
+        return self._remember(version)
+
+    def bump(self):
+        with transaction.atomic():
+            CacheVersion.objects.get_or_create(name=self.name)
+            CacheVersion.objects.filter(name=self.name).update(
+                version=F('version') + 1,
+            )
+            version = CacheVersion.objects.get(name=self.name).version
+        return self._remember(version)
+
+
+ingredients_version = VersionMonitor('ingredients')
+tags_version = VersionMonitor('tags')
@@ -0,0 +1,80 @@
+import threading
+
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+COUNTERS = (
+    ('recipe.Recipe', 'favorites_count', 'recipe.Favorite', 'recipe'),
+    (
+        'recipe.Recipe',
+        'shopping_carts_count',
+        'recipe.ShoppingСart',
+        'recipe',
+    ),
+    ('users.User', 'recipes_count', 'recipe.Recipe', 'author'),
+    ('users.User', 'subscribers_count', 'users.Subscription', 'author'),
+)
+
+
+_deleting = threading.local()
+
+
+def deleting():
+    if not hasattr(_deleting, 'rows'):
+        _deleting.rows = set()
+    return _deleting.rows
+
+
+def mark_deleting(instance):
+    deleting().add((instance._meta.label, instance.pk))
+
+
+def unmark_deleting(instance):
+    deleting().discard((instance._meta.label, instance.pk))
+
+
+def change_counter(model, pk, field, delta):
+    if pk is None or (model._meta.label, pk) in deleting():
+        return
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def actual_count(source, field):
+    return Coalesce(
+        Subquery(
+            source.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk'),
+            ).values('total')
+        ),
+        0,
+    )
+
+
+def recount(apps=global_apps, batch_size=10000, dry_run=False):
+    drift = {}
+    for target_label, counter, source_label, field in COUNTERS:
+        target = apps.get_model(target_label)
+        source = apps.get_model(source_label)
+        last = target.objects.order_by('-pk').values_list('pk', flat=True)
+        last = last.first() or 0
+        drift[f'{target_label}.{counter}'] = 0
+        for start in range(0, last + 1, batch_size):
+            batch = target.objects.filter(
+                pk__gte=start,
+                pk__lt=start + batch_size,
+            )
+            stale = batch.annotate(
+                actual=actual_count(source, field),
+            ).exclude(**{counter: F('actual')})
+            if dry_run:
+                drift[f'{target_label}.{counter}'] += stale.count()
+                continue
+            drift[f'{target_label}.{counter}'] += batch.filter(
+                pk__in=stale.values('pk'),
+            ).update(**{counter: actual_count(source, field)})
+    return drift
@@ -0,0 +1,127 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_VARIANTS_DIR = 'recipes/images/variants/'
+IMAGE_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+    thread_name_prefix='image-variants',
+)
+
+
+def open_image(storage, name):
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def flatten(image):
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def encode(image, file_format, options):
+    buffer = BytesIO()
+    if file_format == 'JPEG':
+        image = flatten(image)
+    image.save(buffer, file_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def render_variants(storage, source):
+    image = open_image(storage, source)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    variants = {'source': source}
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[variant] = {
+            extension: storage.save(
+                f'{IMAGE_VARIANTS_DIR}{stem}_{variant}.{extension}',
+                encode(resized, file_format, options),
+            )
+            for extension, file_format, options in IMAGE_FORMATS
+        }
+    return variants
+
+
+def variant_files(variants):
+    return {
+        name
+        for variant, files in variants.items()
+        if variant != 'source'
+        for name in files.values()
+    }
+
+
+def delete_files(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def build_variants(recipe_id, source):
+    from .models import Recipe
+
+    try:
+        storage = Recipe._meta.get_field('image').storage
+        variants = render_variants(storage, source)
+        with transaction.atomic():
+            previous = Recipe.objects.select_for_update().filter(
+                pk=recipe_id,
+                image=source,
+            ).values_list('image_variants', flat=True).first()
+            if previous is not None:
+                Recipe.objects.filter(pk=recipe_id).update(
+                    image_variants=variants,
+                )
+        if previous is None:
+            delete_files(storage, variant_files(variants))
+        else:
+            delete_files(
+                storage,
+                variant_files(previous) - variant_files(variants),
+            )
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить изображения рецепта %s', recipe_id,
+        )
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe):
+    recipe_id, source = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: executor.submit(build_variants, recipe_id, source)
+    )
+
+
+def schedule_variants_removal(recipe):
+    storage = recipe._meta.get_field('image').storage
+    names = variant_files(recipe.image_variants)
+    transaction.on_commit(lambda: delete_files(storage, names))
@@ -1,20 +1,128 @@
-from django.core.management.base import BaseCommand
-from recipe.models import Ingredient
-from django.conf import settings
+import csv
 import json
+import re
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipe.cache_versions import ingredients_version
+from recipe.models import Ingredient
+
+WHITESPACE = re.compile(r'[\s,]*')
+FIELDS = ('name', 'measurement_unit')
+CSV_HEADER = list(FIELDS)
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = chunk = ' '
+    while chunk and not buffer.strip():
+        chunk = file.read(chunk_size)
+        buffer = chunk.lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать список объектов.')
+    position = 1
+    eof = False
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('JSON-файл обрывается или повреждён.')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def iter_json(file):
+    for index, item in enumerate(iter_json_array(file)):
+        if not isinstance(item, dict):
+            raise CommandError(
+                f'{file.name}, элемент {index}: ожидался объект.'
+            )
+        missing = [key for key in FIELDS if key not in item]
+        if missing:
+            raise CommandError(
+                f'{file.name}, элемент {index}: нет ключа {missing[0]}.'
+            )
+        yield item['name'], item['measurement_unit']
+
+
+def iter_csv(file):
+    rows = csv.reader(file)
+    for row in rows:
+        if row == CSV_HEADER or not any(cell.strip() for cell in row):
+            continue
+        if len(row) != len(CSV_HEADER):
+            raise CommandError(
+                f'{file.name}, строка {rows.line_num}: ожидалось '
+                f'{len(CSV_HEADER)} столбца, получено {len(row)}.'
+            )
+        name, measurement_unit = row
+        yield name, measurement_unit
+
+
+READERS = {
+    'json': iter_json,
+    'csv': iter_csv,
+}
 
 
 class Command(BaseCommand):
 
+    help = (
+        'Загружает ингредиенты из JSON или CSV пачками; '
+        'уже существующие пары (name, measurement_unit) пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=f'{settings.BASE_DIR}/data/ingredients.json',
+        )
+        parser.add_argument('--format', choices=tuple(READERS))
+        parser.add_argument('--batch-size', type=int, default=1000)
+
     def handle(self, *args, **options):
-        data_path = f'{settings.BASE_DIR}/data/ingredients.json'
-        with open(data_path, encoding='utf-8') as file:
-            data = json.load(file)
-        ingredients = []
-        for item in data:
-            ingredient = Ingredient(
-                name=item['name'],
-                measurement_unit=item['measurement_unit'],
-            )
-            ingredients.append(ingredient)
-        Ingredient.objects.bulk_create(ingredients)
+        data_path = options['path']
+        data_format = options['format'] or data_path.rsplit('.', 1)[-1]
+        if data_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {data_format}.')
+        batch_size = options['batch_size']
+        before = Ingredient.objects.count()
+        processed = 0
+        started = time.monotonic()
+        with open(data_path, encoding='utf-8', newline='') as file:
+            rows = READERS[data_format](file)
+            while True:
+                batch = [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                processed += len(batch)
+                if options['verbosity'] > 1:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'{processed} строк, '
+                        f'{processed / max(elapsed, 1e-9):.0f} строк/с'
+                    )
+        elapsed = time.monotonic() - started
+        created = Ingredient.objects.count() - before
+        if created:
+            ingredients_version.bump()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {processed} строк за {elapsed:.1f} с '
+            f'({processed / max(elapsed, 1e-9):.0f} строк/с), '
+            f'добавлено {created} ингредиентов.'
+        ))
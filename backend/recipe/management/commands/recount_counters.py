@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from recipe.counters import recount
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Пересчитывает счётчики избранного, списков покупок, рецептов '
+        'и подписчиков и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать количество расхождений.',
+        )
+
+    def handle(self, *args, **options):
+        drift = recount(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'найдено' if options['dry_run'] else 'исправлено'
+        for counter, count in drift.items():
+            self.stdout.write(f'{counter}: {verb} {count}')
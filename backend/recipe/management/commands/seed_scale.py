@@ -0,0 +1,276 @@
+import random
+import time
+from itertools import accumulate, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipe.cache_versions import ingredients_version, tags_version
+from recipe.counters import recount
+from recipe.models import (
+    Amount,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingСart,
+    Tag,
+)
+from recipe.search import rebuild_search_index
+from users.models import Subscription, User
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F4C430', 'dessert'),
+    ('Выпечка', '#C19A6B', 'bakery'),
+    ('Суп', '#B22222', 'soup'),
+    ('Салат', '#7CFC00', 'salad'),
+    ('Напиток', '#1E90FF', 'drink'),
+)
+MEASUREMENT_UNITS = (
+    'г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу',
+)
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'омлет',
+    'паста', 'соус', 'курица', 'говядина', 'рыба', 'грибы', 'сыр',
+    'томаты', 'картофель', 'тыква', 'яблоки', 'ягоды', 'шоколад',
+)
+SEED_IMAGE = 'recipes/images/seed.png'
+
+
+def zipf_weights(count, exponent):
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def skewed(rng, population, cum_weights, count):
+    return rng.choices(population, cum_weights=cum_weights, k=count)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Заполняет базу синтетическими пользователями, рецептами, '
+        'избранным, списками покупок и подписками с неравномерным '
+        'распределением популярности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--amounts-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=10000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def insert(self, model, objects, label):
+        created = 0
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+        self.stdout.write(
+            f'{label}: обработано {created} строк за '
+            f'{time.monotonic() - self.started:.1f} с'
+        )
+
+    def random(self, stage):
+        return random.Random(f'{self.seed}:{stage}')
+
+    def pks(self, queryset):
+        return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk',
+            flat=True,
+        ).first() or 0
+
+    def seed_tags(self):
+        self.insert(
+            Tag,
+            (Tag(name=name, color=color, slug=slug)
+             for name, color, slug in TAGS),
+            'Тэги',
+        )
+        return self.pks(Tag.objects.all())
+
+    def seed_ingredients(self, count):
+        rng = self.random('ingredients')
+        existing = self.pks(Ingredient.objects.all())
+        if existing:
+            return existing
+        self.insert(
+            Ingredient,
+            (
+                Ingredient(
+                    name=f'{rng.choice(WORDS)} {number}',
+                    measurement_unit=rng.choice(MEASUREMENT_UNITS),
+                )
+                for number in range(count)
+            ),
+            'Ингредиенты',
+        )
+        return self.pks(Ingredient.objects.all())
+
+    def seed_users(self, count):
+        start = self.last_pk(User)
+        prefix = f'seed{self.seed}_{start}_'
+        self.insert(
+            User,
+            (
+                User(
+                    username=f'{prefix}{number}',
+                    email=f'{prefix}{number}@foodgram.example',
+                    first_name='Имя',
+                    last_name='Фамилия',
+                    password='!',
+                )
+                for number in range(count)
+            ),
+            'Пользователи',
+        )
+        return self.pks(User.objects.filter(pk__gt=start))
+
+    def seed_recipes(self, count, authors):
+        rng = self.random('recipes')
+        start = self.last_pk(Recipe)
+        author_weights = zipf_weights(len(authors), self.skew)
+        self.insert(
+            Recipe,
+            (
+                Recipe(
+                    author_id=author,
+                    name=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                    text=' '.join(rng.choices(WORDS, k=20)),
+                    image=SEED_IMAGE,
+                    cooking_time=rng.randint(5, 180),
+                )
+                for author in skewed(
+                    rng,
+                    authors,
+                    author_weights,
+                    count,
+                )
+            ),
+            'Рецепты',
+        )
+        return self.pks(Recipe.objects.filter(pk__gt=start))
+
+    def seed_recipe_tags(self, recipes, tags):
+        rng = self.random('tags')
+        through = Recipe.tags.through
+        self.insert(
+            through,
+            (
+                through(recipe_id=recipe, tag_id=tag)
+                for recipe in recipes
+                for tag in rng.sample(
+                    tags,
+                    rng.randint(1, min(3, len(tags))),
+                )
+            ),
+            'Тэги рецептов',
+        )
+
+    def seed_amounts(self, recipes, ingredients, per_recipe):
+        rng = self.random('amounts')
+        weights = zipf_weights(len(ingredients), self.skew)
+        self.insert(
+            Amount,
+            (
+                Amount(
+                    recipe_id=recipe,
+                    ingredients_id=ingredient,
+                    amount=rng.randint(1, 1000),
+                )
+                for recipe in recipes
+                for ingredient in set(skewed(
+                    rng,
+                    ingredients,
+                    weights,
+                    rng.randint(1, per_recipe * 2 - 1),
+                ))
+            ),
+            'Ингредиенты рецептов',
+        )
+
+    def seed_pairs(self, model, count, users, targets, target_field, label):
+        rng = self.random(model._meta.model_name)
+        targets = rng.sample(targets, len(targets))
+        weights = zipf_weights(len(targets), self.skew)
+        self.insert(
+            model,
+            (
+                model(user_id=user, **{f'{target_field}_id': target})
+                for user, target in zip(
+                    (rng.choice(users) for _ in range(count)),
+                    skewed(rng, targets, weights, count),
+                )
+                if user != target or target_field != 'author'
+            ),
+            label,
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError(
+                'Количество пользователей и размер пачки должны быть '
+                'положительными.'
+            )
+        self.seed = options['seed']
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+        with transaction.atomic():
+            tags = self.seed_tags()
+            ingredients = self.seed_ingredients(options['ingredients'])
+            users = self.seed_users(options['users'])
+            recipes = self.seed_recipes(options['recipes'], users)
+            self.seed_recipe_tags(recipes, tags)
+            if ingredients:
+                self.seed_amounts(
+                    recipes,
+                    ingredients,
+                    max(options['amounts_per_recipe'], 1),
+                )
+            if recipes:
+                self.seed_pairs(
+                    Favorite,
+                    options['favorites'],
+                    users,
+                    recipes,
+                    'recipe',
+                    'Избранное',
+                )
+                self.seed_pairs(
+                    ShoppingСart,
+                    options['carts'],
+                    users,
+                    recipes,
+                    'recipe',
+                    'Списки покупок',
+                )
+            self.seed_pairs(
+                Subscription,
+                options['subscriptions'],
+                users,
+                users,
+                'author',
+                'Подписки',
+            )
+        ingredients_version.bump()
+        tags_version.bump()
+        rebuild_search_index()
+        recount(batch_size=max(self.batch_size, 10000))
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - self.started:.1f} с.'
+        ))
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.19 on 2026-10-18 04:32
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    Amount = apps.get_model('recipe', 'Amount')
+    duplicates = Ingredient.objects.values(
+        'name',
+        'measurement_unit',
+    ).annotate(
+        keep=Min('id'),
+        total=models.Count('id'),
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=duplicate['keep'])
+        Amount.objects.filter(ingredients__in=extra).update(
+            ingredients=duplicate['keep'],
+        )
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0020_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
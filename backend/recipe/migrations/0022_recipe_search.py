@@ -0,0 +1,71 @@
+import django.contrib.postgres.search
+from django.db import migrations
+import recipe.models
+
+POSTGRESQL_FORWARD = (
+    '''
+    CREATE FUNCTION recipe_recipe_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER recipe_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON recipe_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipe_recipe_search_vector_update()
+    ''',
+    'UPDATE recipe_recipe SET name = name',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP TRIGGER recipe_recipe_search_vector_trigger ON recipe_recipe',
+    'DROP FUNCTION recipe_recipe_search_vector_update()',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE recipe_recipe_fts USING fts5('
+    "name, text, tokenize = 'unicode61')",
+    'INSERT INTO recipe_recipe_fts (rowid, name, text) '
+    'SELECT id, name, text FROM recipe_recipe',
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE recipe_recipe_fts',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0021_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=recipe.models.PostgreSQLGinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunPython(
+            run({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run({
+                'postgresql': POSTGRESQL_BACKWARD,
+                'sqlite': SQLITE_BACKWARD,
+            }),
+        ),
+    ]
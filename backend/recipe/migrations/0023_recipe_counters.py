@@ -0,0 +1,56 @@
+# Generated by Django 3.2.19 on 2026-10-18 04:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipe.Recipe', 'favorites_count', 'recipe.Favorite', 'recipe'),
+    (
+        'recipe.Recipe',
+        'shopping_carts_count',
+        'recipe.ShoppingСart',
+        'recipe',
+    ),
+    ('users.User', 'recipes_count', 'recipe.Recipe', 'author'),
+    ('users.User', 'subscribers_count', 'users.Subscription', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for target, counter, source, field in COUNTERS:
+        source = apps.get_model(source)
+        apps.get_model(target).objects.update(**{
+            counter: Coalesce(
+                Subquery(
+                    source.objects.filter(
+                        **{field: OuterRef('pk')}
+                    ).order_by().values(field).annotate(
+                        total=Count('pk'),
+                    ).values('total')
+                ),
+                0,
+            ),
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0022_recipe_search'),
+        ('users', '0011_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.19 on 2026-10-18 04:40
+
+from django.db import migrations, models
+from django.db.models import Min, Sum
+
+AMOUNT_LIMIT = 32767
+
+
+def merge_duplicate_amounts(apps, schema_editor):
+    Amount = apps.get_model('recipe', 'Amount')
+    duplicates = Amount.objects.values(
+        'recipe',
+        'ingredients',
+    ).annotate(
+        keep=Min('id'),
+        amount_total=Sum('amount'),
+        total=models.Count('id'),
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        Amount.objects.filter(id=duplicate['keep']).update(
+            amount=min(duplicate['amount_total'], AMOUNT_LIMIT),
+        )
+        Amount.objects.filter(
+            recipe=duplicate['recipe'],
+            ingredients=duplicate['ingredients'],
+        ).exclude(id=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0023_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            merge_duplicate_amounts,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='amount',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredients'), name='unique_amount'),
+        ),
+    ]
@@ -1,7 +1,25 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import Exists, OuterRef, Value
 from users.models import User
 from django.core.validators import MinValueValidator, RegexValidator
 
+from .search import INDEXED_FIELDS, index_recipes, index_recipes_after
+
+
+class PostgreSQLGinIndex(GinIndex):
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().remove_sql(model, schema_editor, **kwargs)
+
 
 class Tag(models.Model):
 
@@ -48,10 +66,58 @@ class Ingredient(models.Model):
     class Meta:
 
         ordering = ('name', )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            ),
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False,
+                    output_field=models.BooleanField(),
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(recipe=OuterRef('pk'), user=user)
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingСart.objects.filter(recipe=OuterRef('pk'), user=user)
+            ),
+        )
+
+    def update(self, **kwargs):
+        if connection.vendor != 'sqlite' or not INDEXED_FIELDS & set(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            index_recipes(pks)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if connection.vendor != 'sqlite':
+            return super().bulk_create(objs, *args, **kwargs)
+        with transaction.atomic(using=self.db):
+            last_pk = self.model.objects.order_by('-pk').values_list(
+                'pk',
+                flat=True,
+            ).first() or 0
+            objs = super().bulk_create(objs, *args, **kwargs)
+            index_recipes_after(last_pk)
+        return objs
+
+
 class Recipe(models.Model):
 
     author = models.ForeignKey(
@@ -69,6 +135,12 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         upload_to='recipes/images/',
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения',
+    )
     text = models.TextField(
         verbose_name='Описание',
         max_length=254,
@@ -94,13 +166,44 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации рецепта',
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
     class Meta:
 
-        ordering = ('-pub_date', )
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+            PostgreSQLGinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx',
+            ),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -140,6 +243,12 @@ class Amount(models.Model):
     class Meta:
 
         ordering = ('recipe', )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredients'],
+                name='unique_amount',
+            ),
+        ]
         verbose_name = 'Ингредиенты в блюде'
         verbose_name_plural = 'Ингредиенты в блюдах'
 
@@ -202,3 +311,24 @@ class ShoppingСart(models.Model):
         ]
         verbose_name = 'Рецепт в списке покупок'
         verbose_name_plural = 'Рецепты в списке покупок'
+
+
+class CacheVersion(models.Model):
+
+    name = models.CharField(
+        verbose_name='Кэш',
+        max_length=50,
+        primary_key=True,
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия',
+        default=0,
+    )
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.version}'
+
+    class Meta:
+
+        verbose_name = 'Версия кэша'
+        verbose_name_plural = 'Версии кэшей'
@@ -0,0 +1,110 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipe_recipe_fts'
+FTS_WEIGHTS = (10.0, 1.0)
+INDEXED_FIELDS = frozenset(('name', 'text'))
+INDEX_BATCH_SIZE = 500
+
+
+def fts_query(query):
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_postgresql(queryset, query):
+    search_query = SearchQuery(
+        query,
+        config=SEARCH_CONFIG,
+        search_type='websearch',
+    )
+    return queryset.filter(search_vector=search_query).annotate(
+        search_rank=SearchRank(F('search_vector'), search_query),
+    )
+
+
+def search_sqlite(queryset, query):
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    return queryset.extra(
+        select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+        tables=(FTS_TABLE,),
+        where=(
+            f'{FTS_TABLE}.rowid = recipe_recipe.id',
+            f'{FTS_TABLE} MATCH %s',
+        ),
+        params=(fts_query(query),),
+    )
+
+
+def search_recipes(queryset, query):
+    if connection.vendor == 'postgresql':
+        queryset = search_postgresql(queryset, query)
+    elif connection.vendor == 'sqlite':
+        if not fts_query(query):
+            return queryset.none()
+        queryset = search_sqlite(queryset, query)
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+
+def index_recipe(recipe):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, text) '
+            f'VALUES (%s, %s, %s)',
+            (recipe.pk, recipe.name, recipe.text),
+        )
+
+
+def index_recipes(pks):
+    if connection.vendor != 'sqlite':
+        return
+    pks = list(pks)
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), INDEX_BATCH_SIZE):
+            batch = pks[start:start + INDEX_BATCH_SIZE]
+            placeholders = ', '.join('%s' for _ in batch)
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, text) '
+                f'SELECT id, name, text FROM recipe_recipe '
+                f'WHERE id IN ({placeholders})',
+                batch,
+            )
+
+
+def index_recipes_after(pk):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, text) '
+            f'SELECT id, name, text FROM recipe_recipe WHERE id > %s',
+            (pk,),
+        )
+
+
+def unindex_recipe(pk):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (pk,))
+
+
+def rebuild_search_index():
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+            f'SELECT id, name, text FROM recipe_recipe'
+        )
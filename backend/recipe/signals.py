@@ -0,0 +1,93 @@
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from users.models import User
+from .counters import change_counter, mark_deleting, unmark_deleting
+from .images import schedule_variants, schedule_variants_removal
+from .models import Favorite, Recipe, ShoppingСart
+from .search import index_recipe, unindex_recipe
+
+
+@receiver(post_save, sender=Recipe)
+def prepare_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if instance.image_variants.get('source') != instance.image.name:
+        schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_image_variants(sender, instance, **kwargs):
+    schedule_variants_removal(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_recipe(instance.pk)
+
+
+@receiver(post_init, sender=Recipe)
+def remember_author(sender, instance, **kwargs):
+    instance._saved_author_id = instance.__dict__.get('author_id')
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipes_count(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if raw:
+        return
+    previous = instance._saved_author_id
+    instance._saved_author_id = instance.author_id
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+    elif previous != instance.author_id and (
+        update_fields is None or 'author' in update_fields
+    ):
+        change_counter(User, previous, 'recipes_count', -1)
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(pre_delete, sender=Recipe)
+def mark_recipe_deleting(sender, instance, **kwargs):
+    mark_deleting(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    unmark_deleting(instance)
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingСart)
+def increment_shopping_carts_count(
+    sender, instance, created, raw=False, **kwargs
+):
+    if created and not raw:
+        change_counter(Recipe, instance.recipe_id, 'shopping_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingСart)
+def decrement_shopping_carts_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'shopping_carts_count', -1)
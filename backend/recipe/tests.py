@@ -1,3 +1,448 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.db.models import F, Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from .images import (
+    IMAGE_VARIANTS,
+    IMAGE_VARIANTS_DIR,
+    build_variants,
+    render_variants,
+    variant_files,
+)
+from users.models import Subscription, User
+from .paginators import EstimatedCountPaginator
+from .models import (
+    Amount,
+    CacheVersion,
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingСart,
+    Tag,
+)
+
+
+class ImageVariantsTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.storage = FileSystemStorage(location=self.media_root)
+
+    def save_image(self, size, mode='RGB', file_format='JPEG', **options):
+        buffer = BytesIO()
+        Image.new(mode, size, 'red').save(buffer, file_format, **options)
+        return self.storage.save(
+            f'recipes/images/source.{file_format.lower()}',
+            ContentFile(buffer.getvalue()),
+        )
+
+    def test_variants_are_resized_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        source = self.save_image((3000, 2000), exif=exif.tobytes())
+        variants = render_variants(self.storage, source)
+        self.assertEqual(variants['source'], source)
+        for variant, (width, height) in IMAGE_VARIANTS.items():
+            for name in variants[variant].values():
+                with self.storage.open(name) as file:
+                    image = Image.open(file)
+                    self.assertLessEqual(image.width, width)
+                    self.assertLessEqual(image.height, height)
+                    self.assertGreater(image.height, image.width)
+                    self.assertEqual(len(image.getexif()), 0)
+        with self.storage.open(variants['card']['webp']) as file:
+            self.assertEqual(Image.open(file).format, 'WEBP')
+
+    def test_transparent_png_is_flattened_for_jpeg(self):
+        source = self.save_image((200, 200), 'RGBA', 'PNG')
+        variants = render_variants(self.storage, source)
+        with self.storage.open(variants['full']['jpg']) as file:
+            self.assertEqual(Image.open(file).mode, 'RGB')
+
+    @mock.patch('recipe.images.executor')
+    def test_new_image_schedules_variants(self, executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                name='Рецепт',
+                image='recipes/images/test.png',
+                text='Описание',
+                cooking_time=10,
+            )
+        executor.submit.assert_called_once_with(
+            mock.ANY, recipe.pk, 'recipes/images/test.png',
+        )
+        executor.submit.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image_variants = {'source': 'recipes/images/test.png'}
+            recipe.save()
+        executor.submit.assert_not_called()
+
+    @mock.patch('recipe.images.connections')
+    @mock.patch('recipe.images.executor')
+    def test_replaced_and_deleted_variants_are_removed(self, *mocks):
+        first = self.save_image((300, 300))
+        second = self.save_image((300, 300))
+        with self.settings(MEDIA_ROOT=self.media_root):
+            recipe = Recipe.objects.create(
+                name='Рецепт',
+                image=first,
+                text='Описание',
+                cooking_time=10,
+            )
+            build_variants(recipe.pk, first)
+            recipe.refresh_from_db()
+            first_files = variant_files(recipe.image_variants)
+            recipe.image = second
+            recipe.save()
+            build_variants(recipe.pk, second)
+            build_variants(recipe.pk, first)
+            recipe.refresh_from_db()
+            second_files = variant_files(recipe.image_variants)
+            self.assertEqual(recipe.image_variants['source'], second)
+            variants_dir = os.path.join(self.media_root, IMAGE_VARIANTS_DIR)
+            self.assertEqual(set(os.listdir(variants_dir)), {
+                os.path.basename(name) for name in second_files
+            })
+            self.assertFalse(first_files & second_files)
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.delete()
+            self.assertEqual(os.listdir(variants_dir), [])
+
+
+class DataLoadTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def load(self, path, **options):
+        call_command('data_load', path=path, stdout=StringIO(), **options)
+
+    def test_loading_twice_does_not_duplicate(self):
+        path = self.write('ingredients.json', json.dumps([
+            {'name': f'ингредиент {i}', 'measurement_unit': 'г'}
+            for i in range(25)
+        ] + [{'name': 'ингредиент 0', 'measurement_unit': 'г'}]))
+        self.load(path, batch_size=10)
+        version = CacheVersion.objects.get(name='ingredients')
+        self.assertEqual(version.version, 1)
+        self.load(path, batch_size=10)
+        self.assertEqual(Ingredient.objects.count(), 25)
+        version.refresh_from_db()
+        self.assertEqual(version.version, 1)
+
+    def test_csv_and_same_name_with_other_unit(self):
+        path = self.write(
+            'ingredients.csv',
+            'name,measurement_unit\nсоль,г\nсоль,щепотка\n"соль, морская",г\n',
+        )
+        self.load(path)
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {('соль', 'г'), ('соль', 'щепотка'), ('соль, морская', 'г')},
+        )
+
+    def test_json_malformed_items(self):
+        for content, error in (
+            ('[{"name": "q"}]', 'элемент 0: нет ключа measurement_unit.'),
+            ('[{"name": "соль", "measurement_unit": "г"}, 1]',
+             'элемент 1: ожидался объект.'),
+        ):
+            path = self.write('ingredients.json', content)
+            with self.assertRaisesMessage(CommandError, f'{path}, {error}'):
+                self.load(path)
+        self.assertEqual(Ingredient.objects.count(), 0)
+
+    def test_csv_blank_and_malformed_rows(self):
+        path = self.write('ingredients.csv', 'соль,г\n\n , \nперец\n')
+        with self.assertRaisesMessage(
+            CommandError,
+            f'{path}, строка 4: ожидалось 2 столбца, получено 1.',
+        ):
+            self.load(path)
+        self.assertEqual(Ingredient.objects.count(), 0)
+        path = self.write('ingredients.csv', 'соль,г\n\n , \n')
+        self.load(path)
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+
+class CountersTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(
+            username='author',
+            email='author@example.com',
+        )
+        self.reader = User.objects.create(
+            username='reader',
+            email='reader@example.com',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            name='Рецепт',
+            image='recipes/images/test.png',
+            text='Описание',
+            cooking_time=10,
+        )
+
+    def counters(self):
+        self.author.refresh_from_db()
+        self.recipe.refresh_from_db()
+        return (
+            self.author.recipes_count,
+            self.author.subscribers_count,
+            self.recipe.favorites_count,
+            self.recipe.shopping_carts_count,
+        )
+
+    def test_counters_follow_changes(self):
+        favorite = Favorite.objects.create(
+            user=self.reader,
+            recipe=self.recipe,
+        )
+        ShoppingСart.objects.create(user=self.reader, recipe=self.recipe)
+        Subscription.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(), (1, 1, 1, 1))
+        favorite.delete()
+        Subscription.objects.all().delete()
+        self.assertEqual(self.counters(), (1, 0, 0, 1))
+        self.recipe.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_author_change_moves_recipe_count(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.author = self.reader
+        recipe.save()
+        self.reader.refresh_from_db()
+        self.assertEqual(self.counters()[0], 0)
+        self.assertEqual(self.reader.recipes_count, 1)
+        recipe.delete()
+        self.reader.refresh_from_db()
+        self.assertEqual(self.reader.recipes_count, 0)
+
+    def test_counters_never_go_negative(self):
+        Recipe.objects.update(favorites_count=0)
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Recipe.objects.update(favorites_count=0)
+        Favorite.objects.all().delete()
+        self.assertEqual(self.counters()[2], 0)
+
+    def test_cascade_does_not_update_deleted_recipe(self):
+        for number in range(5):
+            user = User.objects.create(
+                username=f'fan{number}',
+                email=f'fan{number}@example.com',
+            )
+            Favorite.objects.create(user=user, recipe=self.recipe)
+            ShoppingСart.objects.create(user=user, recipe=self.recipe)
+        with CaptureQueriesContext(connection) as context:
+            self.recipe.delete()
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "recipe_recipe"')
+        ]
+        self.assertEqual(updates, [])
+
+    def test_recount_fixes_drift(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Recipe.objects.update(favorites_count=5, shopping_carts_count=2)
+        User.objects.update(recipes_count=0)
+        out = StringIO()
+        call_command('recount_counters', '--dry-run', stdout=out)
+        self.assertIn(
+            'recipe.Recipe.favorites_count: найдено 1',
+            out.getvalue(),
+        )
+        self.assertEqual(self.counters(), (0, 0, 5, 2))
+        call_command('recount_counters', '--batch-size', '1', stdout=out)
+        self.assertEqual(self.counters(), (1, 0, 1, 0))
+
+
+class AdminChangelistTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password',
+        )
+        self.client.force_login(self.admin)
+
+    def create_recipes(self, count):
+        for number in range(count):
+            Recipe.objects.create(
+                author=self.admin,
+                name=f'Рецепт {number}',
+                image='recipes/images/test.png',
+                text='Описание',
+                cooking_time=10,
+            )
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/recipe/recipe/')
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        self.create_recipes(2)
+        queries = self.changelist_queries()
+        self.create_recipes(20)
+        self.assertEqual(self.changelist_queries(), queries)
+
+    def test_paginator_counts_exactly_for_filtered_querysets(self):
+        self.create_recipes(3)
+        paginator = EstimatedCountPaginator(
+            Recipe.objects.filter(name__startswith='Рецепт 1'),
+            10,
+        )
+        self.assertIsNone(paginator.estimated_count())
+        self.assertEqual(paginator.count, 1)
+
+
+class QueryPlanTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='user',
+            email='user@example.com',
+        )
+        Tag.objects.create(name='Обед', color='#00ff00', slug='lunch')
+        self.ingredient = Ingredient.objects.create(
+            name='Соль',
+            measurement_unit='г',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='Рецепт',
+            image='recipes/images/test.png',
+            text='Описание',
+            cooking_time=10,
+        )
+
+    def hot_querysets(self):
+        recipes = Recipe.objects.with_user_flags(self.user)
+        return {
+            'favorites': recipes.filter(favorites__user=self.user),
+            'shopping_cart': recipes.filter(
+                in_shopping_carts__user=self.user,
+            ),
+            'tags': recipes.filter(tags__slug__in=('lunch',)).distinct(),
+            'author': recipes.filter(author=self.user),
+            'amount': Amount.objects.filter(
+                recipe=self.recipe,
+                ingredients=self.ingredient,
+            ),
+            'download': Amount.objects.filter(
+                recipe__in_shopping_carts__user=self.user,
+            ).values('ingredients__name').annotate(total=Sum('amount')),
+        }
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain().splitlines()
+
+    def sequential_scans(self, queryset):
+        if connection.vendor == 'postgresql':
+            return [
+                line for line in self.plan(queryset) if 'Seq Scan' in line
+            ]
+        return [
+            line for line in self.plan(queryset)
+            if re.search(r'\bSCAN\b', line) and 'USING' not in line
+        ]
+
+    def sorts(self, plan):
+        if connection.vendor == 'postgresql':
+            return [line for line in plan if re.search(r'(^|->)\s*Sort', line)]
+        return [line for line in plan if 'USE TEMP B-TREE' in line]
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_querysets().items():
+            with self.subTest(name):
+                self.assertEqual(self.sequential_scans(queryset), [])
+
+    def test_feeds_are_read_in_index_order(self):
+        recipes = Recipe.objects.with_user_flags(self.user)
+        for index, queryset in (
+            ('recipe_pub_date_id_idx', recipes),
+            ('recipe_author_pub_date_idx', recipes.filter(author=self.user)),
+        ):
+            with self.subTest(index):
+                plan = self.plan(queryset)
+                self.assertTrue(
+                    any(index in line for line in plan),
+                    plan,
+                )
+                self.assertEqual(self.sorts(plan), [])
+
+
+class SeedScaleTest(TestCase):
+
+    def seed(self):
+        call_command(
+            'seed_scale',
+            '--users', '30',
+            '--recipes', '200',
+            '--ingredients', '50',
+            '--favorites', '1000',
+            '--carts', '100',
+            '--subscriptions', '200',
+            '--batch-size', '64',
+            stdout=StringIO(),
+        )
+
+    def test_seed_is_skewed_and_consistent(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Recipe.objects.count(), 200)
+        self.assertFalse(Subscription.objects.filter(
+            author=F('user'),
+        ).exists())
+        counts = sorted(
+            Recipe.objects.values_list('favorites_count', flat=True),
+            reverse=True,
+        )
+        self.assertEqual(sum(counts), Favorite.objects.count())
+        self.assertGreater(counts[0], 10 * counts[len(counts) // 2])
+        out = StringIO()
+        call_command('recount_counters', '--dry-run', stdout=out)
+        self.assertNotIn('найдено 1', out.getvalue())
 
-# Create your tests here.
+    def test_same_seed_gives_same_data(self):
+        self.seed()
+        first = list(Recipe.objects.order_by('pk').values_list(
+            'name',
+            'cooking_time',
+        ))
+        Recipe.objects.all().delete()
+        User.objects.all().delete()
+        self.seed()
+        second = list(Recipe.objects.order_by('pk').values_list(
+            'name',
+            'cooking_time',
+        ))
+        self.assertEqual(first, second)
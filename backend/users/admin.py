@@ -1,4 +1,5 @@
 from django.contrib import admin
+from recipe.paginators import EstimatedCountPaginator
 from .models import User
 
 
@@ -7,15 +8,15 @@ class UserAdmin(admin.ModelAdmin):
     list_display = (
         'username',
         'email',
-    )
-    list_filter = (
-        'username',
-        'email',
+        'recipes_count',
+        'subscribers_count',
     )
     search_fields = (
         'username',
         'email',
     )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
@@ -32,6 +32,16 @@ class User(AbstractUser):
         default=False,
         help_text=('Администратор'),
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+    )
 
     def __str__(self):
         return self.username
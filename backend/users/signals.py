@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipe.counters import change_counter, mark_deleting, unmark_deleting
+from .models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(
+    sender, instance, created, raw=False, **kwargs
+):
+    if created and not raw:
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
+
+
+@receiver(pre_delete, sender=User)
+def mark_user_deleting(sender, instance, **kwargs):
+    mark_deleting(instance)
+
+
+@receiver(post_delete, sender=User)
+def unmark_user_deleting(sender, instance, **kwargs):
+    unmark_deleting(instance)